@@ -0,0 +1,113 @@
+"""Benchmarks for data helpers.
+
+In-memory helpers run against synthetic records, and helpers which make API
+requests run against a stub server with controllable latency. Set
+`RAC_ASPACE_BENCHMARK_LATENCY` to change the latency (in seconds) of each
+request.
+"""
+from datetime import datetime
+
+import pytest
+from asnake.jsonmodel import wrap_json_object
+
+from rac_aspace import data_helpers
+from rac_aspace.fetchers import Fetcher
+
+from .synthetic import (make_archival_objects, make_dates, make_notes,
+                        make_rights_statements, make_tree)
+
+RECORD_COUNT = 1000
+QUERY_STRINGS = ["materials are restricted", "closed for research"]
+RESTRICTION_ACTS = ["disallow", "conditional"]
+
+
+@pytest.fixture(scope="module")
+def notes():
+    return make_notes(RECORD_COUNT)
+
+
+@pytest.fixture(scope="module")
+def archival_objects():
+    return make_archival_objects(RECORD_COUNT)
+
+
+def test_get_note_text(benchmark, notes):
+    benchmark(lambda: [data_helpers.get_note_text(note) for note in notes])
+
+
+def test_text_in_note(benchmark, notes):
+    benchmark(lambda: [data_helpers.text_in_note(note, QUERY_STRINGS[0])
+                       for note in notes])
+
+
+def test_note_index_search(benchmark, archival_objects):
+    benchmark(lambda: data_helpers.NoteIndex(
+        archival_objects, note_types=["accessrestrict"]).search_many(QUERY_STRINGS))
+
+
+def test_is_restricted(benchmark, archival_objects):
+    benchmark(lambda: [
+        data_helpers.is_restricted(obj, query_string, RESTRICTION_ACTS)
+        for obj in archival_objects for query_string in QUERY_STRINGS])
+
+
+def test_restriction_evaluator(benchmark, archival_objects):
+    evaluator = data_helpers.RestrictionEvaluator(
+        QUERY_STRINGS, RESTRICTION_ACTS, as_of=datetime(2020, 1, 1))
+    benchmark(lambda: list(evaluator.evaluate(archival_objects)))
+
+
+def test_indicates_restriction(benchmark):
+    statements = make_rights_statements(RECORD_COUNT)
+    benchmark(lambda: [
+        data_helpers.indicates_restriction(statement, RESTRICTION_ACTS)
+        for statement in statements])
+
+
+def test_get_expression(benchmark):
+    dates = make_dates(RECORD_COUNT)
+    benchmark(lambda: [data_helpers.get_expression(date) for date in dates])
+
+
+def test_format_resource_id(benchmark, archival_objects):
+    benchmark(lambda: [data_helpers.format_resource_id(obj)
+                       for obj in archival_objects])
+
+
+@pytest.fixture
+def stub_tree(stub_server, stub_client):
+    records, leaves = make_tree(50)
+    stub_server.records = records
+    return [wrap_json_object(records[uri], stub_client) for uri in leaves]
+
+
+def test_object_locations(benchmark, stub_tree):
+    benchmark.pedantic(
+        lambda: [data_helpers.object_locations(obj) for obj in stub_tree],
+        rounds=3)
+
+
+def test_object_locations_batch(benchmark, stub_tree):
+    benchmark.pedantic(
+        lambda: data_helpers.object_locations_batch(stub_tree), rounds=3)
+
+
+def test_closest_value(benchmark, stub_tree):
+    benchmark.pedantic(
+        lambda: [data_helpers.closest_value(obj, "dates") for obj in stub_tree],
+        rounds=3)
+
+
+def test_closest_value_fetcher(benchmark, stub_tree, stub_client):
+    fetcher = Fetcher(stub_client)
+    benchmark.pedantic(
+        lambda: [data_helpers.closest_value(obj, "dates", fetcher=fetcher)
+                 for obj in stub_tree],
+        rounds=3)
+
+
+def test_closest_value_resolver(benchmark, stub_tree, stub_client):
+    def resolve_all():
+        resolver = data_helpers.ClosestValueResolver(fetcher=Fetcher(stub_client))
+        return [resolver.resolve(obj, "dates") for obj in stub_tree]
+    benchmark.pedantic(resolve_all, rounds=3)
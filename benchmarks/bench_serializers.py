@@ -0,0 +1,37 @@
+"""Benchmarks for serializers."""
+import pytest
+
+from rac_aspace import serializers
+
+from .synthetic import make_archival_objects
+
+ROW_COUNT = 10000
+
+SERIALIZERS = [
+    (serializers.CSVSerializer, "rows.csv"),
+    (serializers.TSVSerializer, "rows.tsv"),
+    (serializers.CSVSerializer, "rows.csv.gz"),
+]
+if serializers.pyarrow:
+    SERIALIZERS.append((serializers.ParquetSerializer, "rows.parquet"))
+
+
+@pytest.fixture(scope="module")
+def rows():
+    return [{"uri": obj["uri"], "title": obj["title"], "id_0": obj["id_0"],
+             "begin": obj["dates"][0]["begin"]}
+            for obj in make_archival_objects(ROW_COUNT)]
+
+
+@pytest.mark.parametrize("serializer_class,filename", SERIALIZERS)
+def test_write_data(benchmark, tmp_path, rows, serializer_class, filename):
+    path = str(tmp_path / filename)
+    benchmark(lambda: serializer_class(path).write_data(rows))
+
+
+@pytest.mark.parametrize("serializer_class,filename", SERIALIZERS)
+def test_iter_rows(benchmark, tmp_path, rows, serializer_class, filename):
+    path = str(tmp_path / filename)
+    serializer_class(path).write_data(rows)
+    reader = serializer_class(path, filemode="r")
+    benchmark(lambda: sum(1 for _ in reader.iter_rows()))
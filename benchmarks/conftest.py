@@ -0,0 +1,66 @@
+"""
+Fixtures for benchmarks
+
+A local stub ArchivesSpace server with controllable latency serves records to
+helpers which make API requests.
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from asnake.client import ASnakeClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves JSON records from the server's `records` after a delay.
+
+    Requests with an `id_set` parameter receive a list of the matching records
+    of the requested type.
+    """
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        ids = parse_qs(url.query).get("id_set[]", parse_qs(url.query).get("id_set"))
+        if ids:
+            record = [self.server.records["{}/{}".format(url.path, i)]
+                      for i in ids if "{}/{}".format(url.path, i) in self.server.records]
+        else:
+            record = self.server.records.get(url.path)
+        body = json.dumps(record if record is not None else {"error": "Not found"})
+        self.send_response(200 if record is not None else 404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture(scope="session")
+def stub_server():
+    """A stub ArchivesSpace server. Set `latency` (seconds) and `records` as needed."""
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    server.latency = float(os.environ.get("RAC_ASPACE_BENCHMARK_LATENCY", 0.002))
+    server.records = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def stub_client(stub_server):
+    """An ArchivesSnake client connected to the stub server."""
+    return ASnakeClient(
+        baseurl="http://127.0.0.1:{}".format(stub_server.server_address[1]))
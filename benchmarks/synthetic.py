@@ -0,0 +1,141 @@
+"""
+Synthetic records for benchmarks
+
+Records are generated at scale from the shapes in `fixtures/`, using seeded
+random values so that every run benchmarks the same data.
+"""
+import json
+import os
+import random
+from copy import deepcopy
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "fixtures")
+WORDS = ["materials", "are", "restricted", "open", "for", "research",
+         "records", "series", "correspondence", "reports", "grant", "files"]
+
+
+def load_fixture(filename):
+    with open(os.path.join(FIXTURES_DIR, filename)) as json_file:
+        return json.load(json_file)
+
+
+def sentence(rng, length=8):
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def make_notes(count, seed=0):
+    """Generates notes of every fixture type with random text."""
+    rng = random.Random(seed)
+    shapes = [load_fixture(f) for f in [
+        "note_bibliography.json", "note_index.json", "note_multi.json",
+        "note_multi_chronology.json", "note_multi_defined.json",
+        "note_multi_ordered.json", "note_single.json"]]
+    notes = []
+    for i in range(count):
+        note = deepcopy(shapes[i % len(shapes)])
+        if "content" in note:
+            note["content"] = [sentence(rng) for _ in note["content"]]
+        for subnote in note.get("subnotes", []):
+            if isinstance(subnote.get("content"), str):
+                subnote["content"] = sentence(rng)
+        notes.append(note)
+    return notes
+
+
+def make_rights_statements(count, seed=0):
+    """Generates rights statements with random end dates."""
+    rng = random.Random(seed)
+    shapes = [load_fixture(f) for f in [
+        "rights_statement_restricted.json", "rights_statement_open.json",
+        "rights_statement_conditional.json",
+        "rights_statement_not_restricted.json"]]
+    statements = []
+    for i in range(count):
+        statement = deepcopy(shapes[i % len(shapes)])
+        statement["end_date"] = "{}-01-01".format(rng.randint(1950, 2150))
+        for act in statement["acts"]:
+            act["end_date"] = "{}-12-31".format(rng.randint(1950, 2150))
+        statements.append(statement)
+    return statements
+
+
+def make_dates(count, seed=0):
+    """Generates dates with and without expressions."""
+    rng = random.Random(seed)
+    shapes = [load_fixture(f) for f in [
+        "date_expression.json", "date_no_expression.json",
+        "date_no_expression_no_end.json"]]
+    dates = []
+    for i in range(count):
+        date = deepcopy(shapes[i % len(shapes)])
+        begin = rng.randint(1850, 2000)
+        date["begin"] = str(begin)
+        if "end" in date:
+            date["end"] = str(begin + rng.randint(0, 50))
+        dates.append(date)
+    return dates
+
+
+def make_archival_objects(count, seed=0):
+    """Generates archival objects with notes, rights statements and dates."""
+    rng = random.Random(seed)
+    shape = load_fixture("archival_object.json")
+    notes = make_notes(count, seed)
+    statements = make_rights_statements(count, seed)
+    dates = make_dates(count, seed)
+    objects = []
+    for i in range(count):
+        obj = deepcopy(shape)
+        obj["uri"] = "/repositories/2/archival_objects/{}".format(i + 1)
+        obj["id_0"] = str(rng.randint(1, 999))
+        obj["notes"] = [dict(notes[i], type="accessrestrict")]
+        obj["rights_statements"] = [statements[i]]
+        obj["dates"] = [dates[i]]
+        objects.append(obj)
+    return objects
+
+
+def make_tree(count, depth=3, containers=20, seed=0):
+    """Generates linked records for a stub server.
+
+    Archival objects are nested `depth` levels deep below a resource, only the
+    resource has dates, and every archival object has an instance in one of
+    `containers` top containers.
+
+    :returns: records keyed by URI, and the URIs of the deepest archival
+            objects.
+    :rtype: tuple
+    """
+    rng = random.Random(seed)
+    resource = load_fixture("archival_object.json")
+    top_container = load_fixture("top_container.json")
+    resource_uri = resource["uri"] = "/repositories/2/resources/1"
+    records = {resource_uri: resource}
+    for i in range(containers):
+        container = deepcopy(top_container)
+        container["uri"] = "/repositories/2/top_containers/{}".format(i + 1)
+        records[container["uri"]] = container
+    leaves = []
+    for i in range(count):
+        ancestors = [{"ref": resource_uri, "level": "collection"}]
+        for level in range(depth):
+            uri = "/repositories/2/archival_objects/{}".format(i * depth + level + 1)
+            records[uri] = {
+                "jsonmodel_type": "archival_object",
+                "uri": uri,
+                "title": sentence(rng, 4),
+                "dates": [],
+                "resource": {"ref": resource_uri},
+                "ancestors": list(ancestors),
+                "instances": [{
+                    "instance_type": "mixed materials",
+                    "jsonmodel_type": "instance",
+                    "sub_container": {
+                        "jsonmodel_type": "sub_container",
+                        "top_container": {
+                            "ref": "/repositories/2/top_containers/{}".format(
+                                rng.randint(1, containers))}}}],
+            }
+            ancestors.insert(0, {"ref": uri, "level": "file"})
+        leaves.append(uri)
+    return records, leaves
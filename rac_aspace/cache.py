@@ -0,0 +1,309 @@
+"""Cache
+
+An optional local record cache, stored in SQLite and keyed by URI. Wrapping an
+ArchivesSnake client in a :class:`CachingClient` lets data helpers, fetchers
+and JSONModelObjects read records from the cache transparently. Entries expire
+after a time-to-live, the cache is trimmed to a maximum size, and expired
+entries are kept until they are trimmed, so that they can be revalidated
+cheaply by comparing their `system_mtime` with search results instead of
+refetching them.
+
+"""
+import json
+import sqlite3
+from threading import Lock
+import time
+
+from . import instrumentation
+
+
+def _normalize_uri(uri):
+    return "/" + uri.lstrip("/")
+
+
+class CachedResponse:
+    """A minimal stand-in for a `requests.Response` served from the cache."""
+
+    status_code = 200
+
+    def __init__(self, text):
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class RecordCache:
+    """Stores the raw JSON of ArchivesSpace records in SQLite."""
+
+    def __init__(self, path=":memory:", ttl=86400, max_entries=100000,
+                 batch_size=1000):
+        """Sets initial attributes for the cache.
+
+        :param str path: the path to the SQLite database. Defaults to an
+                in-memory database.
+        :param int ttl: the number of seconds an entry is fresh for.
+        :param int max_entries: the maximum number of entries to keep. The
+                least recently used entries are evicted first. Eviction runs
+                after every tenth of this number of writes, so the cache may
+                briefly exceed it by up to ten percent.
+        :param int batch_size: the number of new entries and cache hits which
+                are held in memory before they are written to the database in
+                a single transaction. Call :meth:`flush` to write them sooner.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self._evict_interval = max(1, max_entries // 10)
+        self._writes = 0
+        self._pending = {}
+        self._accessed = {}
+        self._unflushed = 0
+        self._lock = Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "uri TEXT PRIMARY KEY, data TEXT, lock_version INTEGER, "
+            "system_mtime TEXT, fetched REAL, accessed REAL)")
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS records_accessed ON records (accessed)")
+        self._connection.commit()
+
+    def __len__(self):
+        with self._lock:
+            self._flush()
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def __contains__(self, uri):
+        return self.get_text(uri) is not None
+
+    def get_text(self, uri, allow_stale=False):
+        """Returns the cached JSON text for a URI.
+
+        :param str uri: an ArchivesSpace URI.
+        :param bool allow_stale: if True, expired entries are also returned.
+
+        :returns: the JSON text, or None if the URI is not cached or has
+                expired.
+        :rtype: str
+        """
+        uri = _normalize_uri(uri)
+        now = time.time()
+        with self._lock:
+            pending = self._pending.get(uri)
+            row = (pending[1], pending[4]) if pending else self._connection.execute(
+                "SELECT data, fetched FROM records WHERE uri = ?",
+                (uri,)).fetchone()
+            if not row or (not allow_stale and row[1] + self.ttl < now):
+                return None
+            self._accessed[uri] = now
+            self._count_unflushed()
+        return row[0]
+
+    def flush(self):
+        """Writes new entries and the access times of recent cache hits to
+        the database.
+
+        Both are otherwise written in batches. Entries which have not been
+        flushed are lost if the process exits.
+        """
+        with self._lock:
+            self._flush()
+
+    def _count_unflushed(self):
+        self._unflushed += 1
+        if self._unflushed >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?)",
+                list(self._pending.values()))
+            self._pending = {}
+        if self._accessed:
+            self._connection.executemany(
+                "UPDATE records SET accessed = ? WHERE uri = ?",
+                [(accessed, uri) for uri, accessed in self._accessed.items()])
+            self._accessed = {}
+        self._connection.commit()
+        self._unflushed = 0
+
+    def get(self, uri, allow_stale=False):
+        """Returns the cached JSON for a URI.
+
+        :param str uri: an ArchivesSpace URI.
+        :param bool allow_stale: if True, expired entries are also returned.
+
+        :returns: the record's JSON, or None if the URI is not cached or has
+                expired.
+        :rtype: dict
+        """
+        text = self.get_text(uri, allow_stale)
+        return json.loads(text) if text is not None else None
+
+    def set(self, uri, data):
+        """Adds or replaces a record in the cache.
+
+        :param str uri: an ArchivesSpace URI.
+        :param dict data: the record's JSON.
+        """
+        now = time.time()
+        uri = _normalize_uri(uri)
+        with self._lock:
+            self._pending[uri] = (
+                uri, json.dumps(data), data.get("lock_version"),
+                data.get("system_mtime"), now, now)
+            self._accessed.pop(uri, None)
+            self._count_unflushed()
+            self._writes += 1
+            evict = self._writes >= self._evict_interval
+        if evict:
+            self.evict()
+
+    def delete(self, uri):
+        """Removes a record from the cache.
+
+        :param str uri: an ArchivesSpace URI.
+        """
+        uri = _normalize_uri(uri)
+        with self._lock:
+            self._pending.pop(uri, None)
+            self._accessed.pop(uri, None)
+            self._connection.execute("DELETE FROM records WHERE uri = ?", (uri,))
+            self._connection.commit()
+
+    def evict(self):
+        """Removes the least recently used entries above the maximum size.
+
+        Expired entries are not removed until they are the least recently
+        used, so that they can be revalidated instead of refetched.
+        """
+        with self._lock:
+            self._flush()
+            self._connection.execute(
+                "DELETE FROM records WHERE uri IN (SELECT uri FROM records "
+                "ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+            self._connection.commit()
+            self._writes = 0
+
+    def stale_uris(self):
+        """Returns URIs of expired entries.
+
+        :rtype: list
+        """
+        with self._lock:
+            self._flush()
+            return [row[0] for row in self._connection.execute(
+                "SELECT uri FROM records WHERE fetched < ?",
+                (time.time() - self.ttl,))]
+
+    def revalidate(self, modification_times):
+        """Refreshes entries which have not been modified.
+
+        Entries whose `system_mtime` matches are marked as freshly fetched, and
+        entries which have been modified are removed.
+
+        :param modification_times: pairs of URI and current `system_mtime`,
+                for example taken from search results.
+        :type modification_times: iterable of tuple
+
+        :returns: the number of entries which were refreshed.
+        :rtype: int
+        """
+        refreshed = 0
+        now = time.time()
+        with self._lock:
+            self._flush()
+            for uri, system_mtime in modification_times:
+                uri = _normalize_uri(uri)
+                row = self._connection.execute(
+                    "SELECT system_mtime FROM records WHERE uri = ?",
+                    (uri,)).fetchone()
+                if not row:
+                    continue
+                if row[0] == system_mtime:
+                    self._connection.execute(
+                        "UPDATE records SET fetched = ? WHERE uri = ?",
+                        (now, uri))
+                    refreshed += 1
+                else:
+                    self._connection.execute(
+                        "DELETE FROM records WHERE uri = ?", (uri,))
+            self._connection.commit()
+        return refreshed
+
+    def revalidate_from_search(self, client, repository_uri, batch_size=50):
+        """Revalidates stale entries in a repository using the search API.
+
+        Only the URI and `system_mtime` of each record are requested, which is
+        much cheaper than refetching the records.
+
+        :param ASnakeClient client: an ArchivesSnake client.
+        :param str repository_uri: the URI of an ArchivesSpace repository.
+        :param int batch_size: the number of URIs to search for at once.
+
+        :returns: the number of entries which were refreshed.
+        :rtype: int
+        """
+        repository_uri = _normalize_uri(repository_uri).rstrip("/")
+        uris = [uri for uri in self.stale_uris()
+                if uri.startswith(repository_uri + "/")]
+        refreshed = 0
+        for start in range(0, len(uris), batch_size):
+            query = "uri:({})".format(" OR ".join(
+                '"{}"'.format(uri) for uri in uris[start:start + batch_size]))
+            results = client.get_paged(
+                "{}/search".format(repository_uri),
+                params={"q": query, "fields": ["uri", "system_mtime"]})
+            refreshed += self.revalidate(
+                (r["uri"], r.get("system_mtime")) for r in results)
+        return refreshed
+
+
+class CachingClient:
+    """Wraps an ArchivesSnake client so that records are read from a cache.
+
+    Requests for single records without query parameters are answered from
+    the cache when possible, and successful responses are added to it. Posts
+    and deletes invalidate the cached record. All other attributes are
+    delegated to the wrapped client, so a CachingClient can be used wherever
+    an ArchivesSnake client is expected.
+    """
+
+    def __init__(self, client, cache=None):
+        """Sets initial attributes for the client.
+
+        :param ASnakeClient client: the client to wrap.
+        :param RecordCache cache: Optional cache to use. Defaults to a new
+                in-memory cache.
+        """
+        self.client = client
+        self.cache = cache if cache is not None else RecordCache()
+
+    def __getattr__(self, key):
+        return getattr(self.client, key)
+
+    def get(self, uri, *args, **kwargs):
+        if args or kwargs.get("params"):
+            return self.client.get(uri, *args, **kwargs)
+        text = self.cache.get_text(uri)
+        instrumentation.record_cache("RecordCache", text is not None)
+        if text is not None:
+            return CachedResponse(text)
+        response = self.client.get(uri, **kwargs)
+        if response.status_code == 200:
+            data = response.json()
+            if isinstance(data, dict) and "uri" in data:
+                self.cache.set(uri, data)
+        return response
+
+    def post(self, uri, *args, **kwargs):
+        self.cache.delete(uri)
+        return self.client.post(uri, *args, **kwargs)
+
+    def delete(self, uri, *args, **kwargs):
+        self.cache.delete(uri)
+        return self.client.delete(uri, *args, **kwargs)
@@ -6,13 +6,19 @@ elements. They can also extend (or invert) relationships between different
 objects.
 
 """
+from collections import OrderedDict, namedtuple
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
 import re
-from rapidfuzz import fuzz
-from asnake.jsonmodel import JSONModelObject
+from rapidfuzz import fuzz, process
+from asnake.jsonmodel import JSONModelObject, wrap_json_object
 from string import Formatter
 
-from .decorators import check_type
+from . import instrumentation
+from .decorators import check_type, instrumented
+
+_TAG_PATTERN = re.compile("<.*?>")
 
 
 @check_type(dict)
@@ -24,46 +30,80 @@ def get_note_text(note):
     :returns: a list containing note content.
     :rtype: list
     """
-    def parse_subnote(subnote):
-        """Parses note content from subnotes.
+    return list(_note_content(note))
 
-        :param dict: an ArchivesSpace subnote.
 
-        :returns: a list containing subnote content.
-        :rtype: list
-        """
-        if subnote["jsonmodel_type"] in [
-                "note_orderedlist", "note_index"]:
-            content = subnote["items"]
-        elif subnote["jsonmodel_type"] in ["note_chronology", "note_definedlist"]:
-            content = []
-            for k in subnote["items"]:
-                for i in k:
-                    content += k.get(i) if isinstance(k.get(i),
-                                                      list) else [k.get(i)]
-        else:
-            content = subnote["content"] if isinstance(
-                subnote["content"], list) else [subnote["content"]]
-        return content
-
-    if note["jsonmodel_type"] == "note_singlepart":
-        content = note["content"]
-    elif note["jsonmodel_type"] == "note_bibliography":
-        data = []
-        data += note["content"]
-        data += note["items"]
-        content = data
-    elif note["jsonmodel_type"] == "note_index":
-        data = []
-        for item in note["items"]:
-            data.append(item["value"])
-        content = data
+def _text_content(note):
+    content = note["content"]
+    if isinstance(content, list):
+        yield from content
     else:
-        subnote_content_list = list(parse_subnote(sn)
-                                    for sn in note["subnotes"])
-        content = [
-            c for subnote_content in subnote_content_list for c in subnote_content]
-    return content
+        yield content
+
+
+def _bibliography_content(note):
+    yield from note["content"]
+    yield from note["items"]
+
+
+def _index_content(note):
+    for item in note["items"]:
+        yield item["value"]
+
+
+def _items_content(note):
+    yield from note["items"]
+
+
+def _list_content(note):
+    for item in note["items"]:
+        for value in item.values():
+            if isinstance(value, list):
+                yield from value
+            else:
+                yield value
+
+
+def _multipart_content(note):
+    for subnote in note["subnotes"]:
+        yield from _NOTE_CONTENT.get(
+            subnote["jsonmodel_type"], _text_content)(subnote)
+
+
+_NOTE_CONTENT = {
+    "note_bibliography": _bibliography_content,
+    "note_chronology": _list_content,
+    "note_definedlist": _list_content,
+    "note_index": _index_content,
+    "note_multipart": _multipart_content,
+    "note_orderedlist": _items_content,
+    "note_singlepart": _text_content,
+}
+"""dict: Functions which yield the content of a note or subnote, keyed by
+jsonmodel_type."""
+
+
+def _note_content(note):
+    """Yields the content of a note, treating unknown note types as multipart."""
+    return _NOTE_CONTENT.get(note["jsonmodel_type"], _multipart_content)(note)
+
+
+@check_type(dict)
+def iter_note_text(archival_object, strip_html=False):
+    """Extracts the text of all notes of an object in a single pass.
+
+    :param dict archival_object: an ArchivesSpace object with notes.
+    :param bool strip_html: if True, HTML tags are removed from the text.
+
+    :yields: tuples of note type and a piece of note text.
+    :yield type: tuple
+    """
+    for note in archival_object.get("notes", []):
+        note_type = note.get("type", note["jsonmodel_type"])
+        for text in _note_content(note):
+            if strip_html:
+                text = _TAG_PATTERN.sub("", text)
+            yield note_type, text
 
 
 @check_type(dict)
@@ -79,52 +119,240 @@ def text_in_note(note, query_string):
     """
     CONFIDENCE_RATIO = 97
     """int: Minimum confidence ratio to match against."""
-    note_content = get_note_text(note)
     ratio = fuzz.token_sort_ratio(
-        " ".join([n.lower() for n in note_content]),
+        _normalized_note_text(note),
         query_string.lower(),
         score_cutoff=CONFIDENCE_RATIO)
     return bool(ratio)
 
 
+def _normalized_note_text(note):
+    """Returns lowercased note content as a single string for fuzzy matching."""
+    return " ".join([n.lower() for n in get_note_text(note)])
+
+
+class NoteIndex:
+    """Normalized note text for many objects, for bulk fuzzy searching.
+
+    Note text is extracted and normalized once when an object is added, and can
+    then be searched for any number of phrases using the same matching rules as
+    :func:`text_in_note`. Identical note texts are only scored once.
+    """
+
+    CONFIDENCE_RATIO = 97
+    """int: Minimum confidence ratio to match against."""
+
+    def __init__(self, objects=None, note_types=None):
+        """Sets initial attributes for the index.
+
+        :param objects: Optional ArchivesSpace objects to add to the index.
+        :type objects: iterable of dict
+        :param list note_types: Optional note types (for example
+                `accessrestrict`) to index. Defaults to all notes.
+        """
+        self.note_types = note_types
+        self.keys = []
+        self._owners = OrderedDict()
+        for obj in objects or []:
+            self.add(obj)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, obj, key=None):
+        """Adds the notes of an object to the index.
+
+        :param dict obj: an ArchivesSpace object with notes.
+        :param key: Optional value identifying the object in search results.
+                Defaults to the object's URI.
+        """
+        self.keys.append(obj.get("uri") if key is None else key)
+        position = len(self.keys) - 1
+        for note in obj.get("notes", []):
+            if self.note_types is None or note.get("type") in self.note_types:
+                self._owners.setdefault(
+                    _normalized_note_text(note), []).append(position)
+
+    def search(self, query_string):
+        """Finds objects with a note matching a query string.
+
+        :param str query_string: a string to match against.
+
+        :returns: keys of the objects with a matching note.
+        :rtype: set
+        """
+        return self.search_many([query_string])[query_string]
+
+    @instrumented
+    def search_many(self, query_strings):
+        """Finds objects with a note matching each of several query strings.
+
+        :param list query_strings: strings to match against.
+
+        :returns: keys of the objects with a matching note, keyed by query
+                string.
+        :rtype: dict
+        """
+        results = {}
+        texts = list(self._owners)
+        for query_string in query_strings:
+            matches = process.extract(
+                query_string.lower(), texts,
+                scorer=fuzz.token_sort_ratio, processor=None,
+                limit=len(texts),
+                score_cutoff=self.CONFIDENCE_RATIO) if texts else []
+            results[query_string] = set(
+                self.keys[position] for match in matches
+                for position in self._owners[match[0]])
+        return results
+
+
 @check_type(JSONModelObject)
-def object_locations(archival_object):
+def object_locations(archival_object, fetcher=None):
     """Finds locations associated with an archival object.
 
     :param JSONModelObject archival_object: an ArchivesSpace archival_object.
+    :param Fetcher fetcher: Optional fetcher used to resolve top containers
+            concurrently.
 
     :returns: Locations objects associated with the archival object.
     :rtype: list
     """
+    top_containers = [
+        instance.sub_container.top_container for instance in archival_object.instances]
+    if fetcher:
+        top_containers = fetcher.fetch(top_containers)
     locations = []
-    for instance in archival_object.instances:
-        top_container = instance.sub_container.top_container.reify()
-        locations += top_container.container_locations
+    for top_container in top_containers:
+        locations += top_container.reify().container_locations
     return locations
 
 
+def _get_top_containers(refs, client, batch_size):
+    """Fetches top containers with `id_set` requests, grouped by repository."""
+    container_ids = OrderedDict()
+    for ref in refs:
+        repository_uri, container_id = ref.rsplit("/top_containers/", 1)
+        container_ids.setdefault(repository_uri, []).append(int(container_id))
+    for repository_uri, ids in container_ids.items():
+        for start in range(0, len(ids), batch_size):
+            response = client.get(
+                "{}/top_containers".format(repository_uri),
+                params={"id_set": ids[start:start + batch_size]})
+            for top_container in response.json():
+                yield wrap_json_object(top_container, client)
+
+
+@instrumented
+def object_locations_batch(archival_objects, client=None, batch_size=250,
+                           fetcher=None):
+    """Finds locations associated with many archival objects.
+
+    Collects the distinct top containers referenced by the archival objects'
+    instances and fetches them in bulk using the `id_set` parameter, so top
+    containers shared by many archival objects are only fetched once.
+
+    :param archival_objects: an iterable of ArchivesSpace archival_objects.
+    :type archival_objects: iterable of JSONModelObject
+    :param ASnakeClient client: the client used to fetch top containers.
+            Defaults to the client of the first archival object.
+    :param int batch_size: the maximum number of top containers to request at
+            once.
+    :param Fetcher fetcher: Optional fetcher used to resolve distinct top
+            containers concurrently instead of with `id_set` requests.
+
+    :returns: Locations objects associated with each archival object, keyed by
+            archival object URI.
+    :rtype: dict
+    """
+    container_refs = OrderedDict()
+    for archival_object in archival_objects:
+        client = client or archival_object._client
+        container_refs[archival_object.uri] = [
+            instance.sub_container.top_container.ref
+            for instance in archival_object.instances]
+    distinct_refs = list(OrderedDict(
+        (ref, None) for refs in container_refs.values() for ref in refs))
+    if fetcher:
+        top_containers = fetcher.fetch(distinct_refs, ordered=False)
+    else:
+        top_containers = _get_top_containers(distinct_refs, client, batch_size)
+    container_locations = {
+        top_container.uri: top_container.container_locations
+        for top_container in top_containers}
+    return OrderedDict(
+        (uri, [location for ref in refs
+               for location in container_locations.get(ref, [])])
+        for uri, refs in container_refs.items())
+
+
 @check_type(JSONModelObject)
 def format_from_obj(obj, format_string):
     """Generates a human-readable string from an object.
 
     :param JSONModelObject location: an ArchivesSpace object.
+    :param str format_string: a format string, which may contain dotted field
+            paths such as `{building.floor}`.
 
     :returns: a string in the chosen format.
     :rtype: str
     """
+    try:
+        return compile_format(format_string)(obj)
+    except KeyError as e:
+        raise KeyError(
+            "The field {} was not found in this object".format(
+                str(e)))
+
+
+@lru_cache(maxsize=256)
+def compile_format(format_string):
+    """Parses a format string once into a reusable formatting function.
+
+    Fields may be dotted paths such as `{building.floor}`, which are resolved
+    through nested objects or dicts. The returned function only looks up the
+    fields used in the format string, and looks up shared path prefixes once
+    per object. Compiled format strings are cached.
+
+    :param str format_string: a format string.
+
+    :returns: a function which takes an object and returns a string in the
+            chosen format.
+    :rtype: callable
+    """
     if not format_string:
         raise Exception("No format string provided.")
-    else:
-        try:
-            d = {}
-            matches = [i[1] for i in Formatter().parse(format_string) if i[1]]
-            for m in matches:
-                d.update({m: getattr(obj, m, "")})
-            return format_string.format(**d)
-        except KeyError as e:
-            raise KeyError(
-                "The field {} was not found in this object".format(
-                    str(e)))
+    template = []
+    paths = []
+    for literal, field, format_spec, conversion in Formatter().parse(
+            format_string):
+        template.append(literal.replace("{", "{{").replace("}", "}}"))
+        if field is not None:
+            template.append("{{{}{}{}}}".format(
+                len(paths),
+                "!" + conversion if conversion else "",
+                ":" + format_spec if format_spec else ""))
+            paths.append(tuple(field.split(".")))
+    template = "".join(template)
+
+    def format_obj(obj):
+        resolved = {(): obj}
+        values = []
+        for path in paths:
+            for depth in range(1, len(path) + 1):
+                if path[:depth] not in resolved:
+                    resolved[path[:depth]] = _get_field(
+                        resolved[path[:depth - 1]], path[depth - 1])
+            values.append(resolved[path])
+        return template.format(*values)
+    return format_obj
+
+
+def _get_field(obj, field):
+    """Returns a field from an object or dict, or an empty string if absent."""
+    if isinstance(obj, dict):
+        return obj[field]
+    return getattr(obj, field, "")
 
 
 @check_type(dict)
@@ -148,7 +376,7 @@ def format_resource_id(resource, separator=":"):
 
 
 @check_type(JSONModelObject)
-def closest_value(archival_object, key):
+def closest_value(archival_object, key, fetcher=None):
     """Finds the closest value matching a key.
 
     Starts with an archival object, and iterates up through its ancestors
@@ -156,26 +384,183 @@ def closest_value(archival_object, key):
 
     :param JSONModelObject archival_object: an ArchivesSpace archival_object.
     :param str key: the key to match against.
+    :param Fetcher fetcher: Optional fetcher used to resolve all ancestors
+            concurrently before they are inspected.
 
     :returns: The value of the key, which could be a str, list, or dict.
     :rtype: str, list, or key
     """
     if getattr(archival_object, key) not in ["", [], {}, None]:
         return getattr(archival_object, key)
+    elif fetcher:
+        for ancestor in fetcher.fetch(archival_object.ancestors):
+            if getattr(ancestor, key) not in ["", [], {}, None]:
+                return getattr(ancestor, key)
     else:
         for ancestor in archival_object.ancestors:
             return closest_value(ancestor, key)
 
 
-def get_orphans(object_list, null_attribute):
+class ClosestValueResolver:
+    """Finds closest values for many archival objects without refetching ancestors.
+
+    Resolved values are stored in a bounded LRU cache keyed by ancestor URI and
+    key, so that series and subseries shared by many archival objects are only
+    fetched and inspected once.
+    """
+
+    CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+    def __init__(self, maxsize=10000, fetcher=None):
+        """Sets initial attributes for the resolver.
+
+        :param int maxsize: the maximum number of (URI, key) pairs to cache.
+        :param Fetcher fetcher: Optional fetcher used by :meth:`resolve_tree`
+                to fetch the children of each node concurrently.
+        """
+        self.maxsize = maxsize
+        self.fetcher = fetcher
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    def _get_cached(self, uri, key):
+        try:
+            value = self._cache[(uri, key)]
+        except KeyError:
+            self.misses += 1
+            instrumentation.record_cache("ClosestValueResolver", False)
+            raise
+        self._cache.move_to_end((uri, key))
+        self.hits += 1
+        instrumentation.record_cache("ClosestValueResolver", True)
+        return value
+
+    def _set_cached(self, uri, key, value):
+        self._cache[(uri, key)] = value
+        self._cache.move_to_end((uri, key))
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def cache_info(self):
+        """Reports cache statistics.
+
+        :returns: hits, misses, maximum size and current size of the cache.
+        :rtype: CacheInfo
+        """
+        return self.CacheInfo(
+            self.hits, self.misses, self.maxsize, len(self._cache))
+
+    def clear(self):
+        """Empties the cache and resets hit and miss counters."""
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @instrumented
+    def resolve(self, archival_object, key):
+        """Finds the closest value matching a key.
+
+        Behaves like :func:`closest_value`, but ancestors which have already
+        been inspected are answered from the cache instead of being fetched.
+
+        :param JSONModelObject archival_object: an ArchivesSpace archival_object.
+        :param str key: the key to match against.
+
+        :returns: The value of the key, which could be a str, list, or dict.
+        :rtype: str, list, or dict
+        """
+        value = getattr(archival_object, key)
+        if value not in ["", [], {}, None]:
+            return value
+        unresolved = []
+        value = None
+        for ancestor in archival_object.ancestors:
+            try:
+                value = self._get_cached(ancestor.uri, key)
+                break
+            except KeyError:
+                unresolved.append(ancestor.uri)
+                ancestor_value = getattr(ancestor.reify(), key)
+                if ancestor_value not in ["", [], {}, None]:
+                    value = ancestor_value
+                    break
+        for uri in unresolved:
+            self._set_cached(uri, key, value)
+        return value
+
+    @instrumented
+    def resolve_tree(self, resource, key, walker=None):
+        """Resolves closest values for every archival object in a resource.
+
+        Walks the resource tree top-down in a single pass, so each record is
+        fetched once and children inherit values from their parents. Resolved
+        values are also added to the cache.
+
+        :param JSONModelObject resource: an ArchivesSpace resource.
+        :param str key: the key to match against.
+        :param TreeWalker walker: Optional tree walker used to traverse the
+                tree breadth-first with prefetching, instead of the full
+                resource tree.
+
+        :yields: tuples of an archival object and its closest value.
+        :yield type: tuple
+        """
+        resource_value = getattr(resource, key)
+        if resource_value in ["", [], {}, None]:
+            resource_value = None
+        self._set_cached(resource.uri, key, resource_value)
+        if walker:
+            yield from self._resolve_walk(resource, key, walker, resource_value)
+            return
+        stack = list(reversed(self._child_records(resource.tree, resource_value)))
+        while stack:
+            node, record, inherited = stack.pop()
+            value = getattr(record, key)
+            if value in ["", [], {}, None]:
+                value = inherited
+            self._set_cached(record.uri, key, value)
+            yield record, value
+            if node.has_children:
+                stack.extend(reversed(self._child_records(node, value)))
+
+    def _resolve_walk(self, resource, key, walker, resource_value):
+        parent_values = {resource.uri: resource_value}
+        values = {}
+        depth = 1
+        for item in walker.walk(resource):
+            if item.depth != depth:
+                parent_values, values, depth = values, {}, item.depth
+            value = getattr(item.record, key)
+            if value in ["", [], {}, None]:
+                value = parent_values[item.context["ancestors"][0]]
+            values[item.record.uri] = value
+            self._set_cached(item.record.uri, key, value)
+            yield item.record, value
+
+    def _child_records(self, node, inherited):
+        children = node.children
+        if self.fetcher:
+            records = self.fetcher.fetch(child.record_uri for child in children)
+        else:
+            records = (child.record for child in children)
+        return [(child, record, inherited)
+                for child, record in zip(children, records)]
+
+
+def get_orphans(object_list, null_attribute, fetcher=None):
     """Finds objects in a list which do not have a value in a specified field.
 
     :param list object_list: a list of ArchivesSpace objects.
     :param null_attribute: an attribute which must be empty or null.
+    :param Fetcher fetcher: Optional fetcher used to resolve objects
+            concurrently.
 
     :yields: a list of ArchivesSpace objects.
     :yield type: dict
     """
+    if fetcher:
+        object_list = fetcher.fetch(object_list)
     for obj in object_list:
         if getattr(obj, null_attribute) in ["", [], {}, None]:
             yield obj
@@ -203,27 +588,41 @@ def get_expression(date):
 
 
 @check_type(dict)
-def indicates_restriction(rights_statement, restriction_acts):
+def indicates_restriction(rights_statement, restriction_acts, as_of=None):
     """Parses a rights statement to determine if it indicates a restriction.
 
+    Rights statements and acts without an end date do not expire.
+
     :param dict rights_statement: an ArchivesSpace rights statement.
+    :param list restriction_acts: a list of strings to match restriction act against.
+    :param datetime as_of: Optional date against which expiration is checked.
+            Defaults to now.
 
     :returns: True if rights statement indicates a restriction, False if not.
     :rtype: bool
     """
+    return bool(_restricting_act(
+        rights_statement, restriction_acts, as_of or datetime.now()))
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(date):
+    """Parses an ArchivesSpace date string, caching the result."""
+    return datetime.strptime(date, "%Y-%m-%d")
+
+
+def _restricting_act(rights_statement, restriction_acts, as_of):
+    """Returns the first unexpired act matching a restriction, or None."""
     def is_expired(date):
-        today = datetime.now()
-        date = date if date else datetime.strftime("%Y-%m-%d")
-        return False if (
-            datetime.strptime(date, "%Y-%m-%d") >= today) else True
+        return bool(date) and _parse_date(date) < as_of
 
     if is_expired(rights_statement.get("end_date")):
-        return False
+        return None
     for act in rights_statement.get("acts"):
         if (act.get("restriction")
                 in restriction_acts and not is_expired(act.get("end_date"))):
-            return True
-    return False
+            return act
+    return None
 
 
 @check_type(dict)
@@ -251,12 +650,82 @@ def is_restricted(archival_object, query_string, restriction_acts):
     return False
 
 
+class RestrictionEvaluator:
+    """Determines whether many archival objects are restricted.
+
+    Applies the same rules as :func:`is_restricted` to a stream of archival
+    objects. Objects are processed in batches: access restriction notes are
+    searched for all query strings at once using a :class:`NoteIndex`, and
+    rights statements are evaluated against a single "as-of" date, with each
+    distinct date string parsed only once.
+    """
+
+    Result = namedtuple("Result", ["key", "restricted", "reason"])
+
+    def __init__(self, query_strings, restriction_acts, as_of=None,
+                 batch_size=1000):
+        """Sets initial attributes for the evaluator.
+
+        :param list query_strings: strings to match access restriction notes
+                against.
+        :param list restriction_acts: a list of strings to match restriction
+                act against.
+        :param datetime as_of: Optional date against which expiration is
+                checked. Defaults to now.
+        :param int batch_size: the number of objects to evaluate at once.
+        """
+        self.query_strings = query_strings
+        self.restriction_acts = restriction_acts
+        self.as_of = as_of or datetime.now()
+        self.batch_size = batch_size
+
+    @instrumented
+    def evaluate(self, archival_objects):
+        """Evaluates restrictions for a stream of archival objects.
+
+        :param archival_objects: ArchivesSpace archival_objects.
+        :type archival_objects: iterable of dict
+
+        :yields: a result for each archival object, containing its URI, whether
+                it is restricted, and the reason for the restriction: either
+                `note:` followed by the matching query string, or
+                `rights_statement:` followed by the matching restriction act.
+        :yield type: RestrictionEvaluator.Result
+        """
+        archival_objects = iter(archival_objects)
+        for batch in iter(
+                lambda: list(islice(archival_objects, self.batch_size)), []):
+            yield from self._evaluate_batch(batch)
+
+    def _evaluate_batch(self, batch):
+        index = NoteIndex(note_types=["accessrestrict"])
+        for position, archival_object in enumerate(batch):
+            index.add(archival_object, key=position)
+        note_reasons = {}
+        for query_string, positions in index.search_many(
+                self.query_strings).items():
+            for position in positions:
+                note_reasons.setdefault(position, "note:" + query_string)
+        for position, archival_object in enumerate(batch):
+            reason = note_reasons.get(position)
+            if not reason:
+                reason = self._rights_reason(archival_object)
+            yield self.Result(
+                archival_object.get("uri"), bool(reason), reason)
+
+    def _rights_reason(self, archival_object):
+        for rights_statement in archival_object.get("rights_statements", []):
+            act = _restricting_act(
+                rights_statement, self.restriction_acts, self.as_of)
+            if act:
+                return "rights_statement:" + act["restriction"]
+        return None
+
+
 @check_type(str)
 def strip_html_tags(string):
     """Strips HTML tags from a string.
 
     :param str string: An input string from which to remove HTML tags.
     """
-    tag_match = re.compile("<.*?>")
-    cleantext = re.sub(tag_match, "", string)
-    return cleantext
+    return _TAG_PATTERN.sub("", string)
@@ -0,0 +1,186 @@
+"""Dates
+
+Normalizes ArchivesSpace date subrecords into compact ranges of proleptic
+Gregorian ordinals (see :meth:`datetime.date.toordinal`), so that records can
+be sorted and filtered by date without parsing date strings again. Parsing is
+cached, since the same date values recur across many records.
+
+"""
+from calendar import monthrange
+from collections import namedtuple
+from datetime import date as Date
+from functools import lru_cache
+import re
+
+from asnake.jsonmodel import JSONModelObject
+
+DateRange = namedtuple("DateRange", ["begin", "end"])
+"""namedtuple: An inclusive range of dates, as integer ordinals.
+
+Use :meth:`datetime.date.fromordinal` to convert either end back to a date."""
+
+_DATE_PATTERN = re.compile(r"^\s*(\d{1,4})(?:-(\d{1,2}))?(?:-(\d{1,2}))?")
+_YEAR_PATTERN = re.compile(r"(?<!\d)(\d{4})(?!\d)")
+
+
+@lru_cache(maxsize=65536)
+def to_ordinal(value, end=False):
+    """Converts an ArchivesSpace date string to an ordinal.
+
+    Dates may be years (`1905`), months (`1905-03`) or days (`1905-03-12`).
+    Incomplete dates are expanded to their first day, or to their last day if
+    `end` is True.
+
+    :param str value: a date string.
+    :param bool end: whether the date ends a range.
+
+    :returns: the ordinal of the date, or None if it cannot be parsed.
+    :rtype: int
+    """
+    match = _DATE_PATTERN.match(value or "")
+    if not match:
+        return None
+    year, month, day = (int(part) if part else None for part in match.groups())
+    if not year or (month and not 1 <= month <= 12):
+        return None
+    month = month or (12 if end else 1)
+    last_day = monthrange(year, month)[1]
+    day = min(day or (last_day if end else 1), last_day)
+    return Date(year, month, day).toordinal()
+
+
+@lru_cache(maxsize=65536)
+def _normalize(begin, end, expression):
+    if begin:
+        first = to_ordinal(begin)
+        last = to_ordinal(end or begin, end=True)
+    else:
+        years = _YEAR_PATTERN.findall(expression or "")
+        if not years:
+            return None
+        first = to_ordinal(min(years))
+        last = to_ordinal(max(years), end=True)
+    if first is None or last is None:
+        return None
+    return DateRange(min(first, last), max(first, last))
+
+
+def normalize_date(date):
+    """Converts a date subrecord into a range of ordinals.
+
+    Uses the `begin` and `end` of the date, and falls back to the earliest and
+    latest years mentioned in its `expression` if it has no `begin`. A date
+    without an `end` covers the whole period of its `begin`.
+
+    :param dict date: an ArchivesSpace date.
+
+    :returns: the range of the date, or None if it cannot be parsed.
+    :rtype: DateRange
+    """
+    return _normalize(date.get("begin"), date.get("end"), date.get("expression"))
+
+
+def _record_dates(record):
+    if isinstance(record, JSONModelObject):
+        record = record._json
+    return record.get("dates", [])
+
+
+def span_ranges(ranges):
+    """Combines DateRanges into the range from the earliest to the latest.
+
+    :param ranges: DateRanges, which may include None.
+    :type ranges: iterable of DateRange
+
+    :rtype: DateRange
+    """
+    ranges = [r for r in ranges if r]
+    if not ranges:
+        return None
+    return DateRange(min(r.begin for r in ranges), max(r.end for r in ranges))
+
+
+def span(records):
+    """Finds the earliest and latest dates across records.
+
+    :param records: ArchivesSpace records with dates, such as an archival
+            object and its ancestors.
+    :type records: iterable of dict or JSONModelObject
+
+    :returns: the range from the earliest begin to the latest end, or None if
+            none of the records have parseable dates.
+    :rtype: DateRange
+    """
+    return span_ranges(normalize_date(date) for record in records
+                       for date in _record_dates(record))
+
+
+def object_spans(archival_objects, fetcher=None):
+    """Finds the earliest and latest dates of archival objects and their
+    ancestors.
+
+    The span of each ancestor is computed once and reused for every archival
+    object which shares it, so ancestors are fetched at most once, and not at
+    all if they have already been passed in as archival objects.
+
+    :param archival_objects: ArchivesSpace archival_objects.
+    :type archival_objects: iterable of JSONModelObject
+    :param Fetcher fetcher: Optional fetcher used to resolve each object's
+            unseen ancestors concurrently.
+
+    :yields: tuples of an archival object's URI and its DateRange, which is
+            None if neither it nor its ancestors have parseable dates.
+    :yield type: tuple
+    """
+    ancestor_spans = {}
+    for archival_object in archival_objects:
+        ancestors = archival_object.ancestors
+        unseen = [a for a in ancestors if a.uri not in ancestor_spans]
+        if fetcher:
+            unseen = fetcher.fetch(unseen)
+        for ancestor in unseen:
+            ancestor_spans[ancestor.uri] = span([ancestor.reify()])
+        own_span = ancestor_spans[archival_object.uri] = span([archival_object])
+        yield archival_object.uri, span_ranges(
+            [own_span] + [ancestor_spans[a.uri] for a in ancestors])
+
+
+def _range_bound(value, end=False):
+    if isinstance(value, Date):
+        return value.toordinal()
+    if isinstance(value, str):
+        return to_ordinal(value, end)
+    return value
+
+
+def overlaps(date_range, begin, end):
+    """Checks whether a DateRange overlaps another range.
+
+    :param DateRange date_range: the range to check.
+    :param begin: the start of the other range, as a date string, a
+            :class:`datetime.date` or an ordinal.
+    :param end: the end of the other range, in the same forms as `begin`.
+
+    :rtype: bool
+    """
+    return bool(date_range) and (
+        date_range.begin <= _range_bound(end, True)
+        and date_range.end >= _range_bound(begin))
+
+
+def overlapping(records, begin, end):
+    """Filters records to those with dates overlapping a range.
+
+    :param records: ArchivesSpace records with dates.
+    :type records: iterable of dict or JSONModelObject
+    :param begin: the start of the range, as a date string (for example
+            `1950`), a :class:`datetime.date` or an ordinal.
+    :param end: the end of the range, in the same forms as `begin`.
+
+    :yields: records with at least one date overlapping the range.
+    """
+    begin, end = _range_bound(begin), _range_bound(end, True)
+    for record in records:
+        if any(overlaps(normalize_date(date), begin, end)
+               for date in _record_dates(record)):
+            yield record
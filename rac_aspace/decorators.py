@@ -1,12 +1,46 @@
 from functools import wraps
+import os
+
+from . import instrumentation
+
+TYPE_CHECKS = os.environ.get(
+    "RAC_ASPACE_SKIP_TYPE_CHECKS", "").lower() not in ("1", "true", "yes")
+"""bool: Whether check_type validates arguments.
+
+Setting the `RAC_ASPACE_SKIP_TYPE_CHECKS` environment variable to `1`, `true`
+or `yes` before importing `rac_aspace` disables type checking, so decorated
+functions are returned undecorated and run without any wrapper overhead. The
+checked functions remain the default.
+"""
 
 
 def check_type(obj_type):
     def real_decorator(func):
+        if not TYPE_CHECKS:
+            return func
+        name = instrumentation.call_name(func)
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             if not isinstance(args[0], obj_type):
                 raise TypeError("{} is not a {}".format(args[0], obj_type))
+            if instrumentation.ACTIVE:
+                return instrumentation.timed_call(name, func, args, kwargs)
             return func(*args, **kwargs)
         return wrapper
     return real_decorator
+
+
+def instrumented(func):
+    """Records calls of a function inside Instrumentation blocks.
+
+    When no block is active the function is called directly.
+    """
+    name = instrumentation.call_name(func)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if instrumentation.ACTIVE:
+            return instrumentation.timed_call(name, func, args, kwargs)
+        return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,206 @@
+"""Deleters
+
+Deleters remove first-class ArchivesSpace records with delete requests, and
+delete field values by fetching a record, removing the values and pushing the
+record back. Field deletions are grouped so each record is fetched and saved
+once, and records are deleted children first, one dependency level at a time.
+
+"""
+from collections import namedtuple, OrderedDict
+
+from asnake.jsonmodel import JSONModelObject
+
+from .fetchers import stream_map
+from .savers import BulkSaver
+
+FieldDeletion = namedtuple("FieldDeletion", ["uri", "field", "value"])
+"""namedtuple: A value to delete from a field of a record.
+
+If `value` is None the whole field is deleted. Otherwise matching items are
+removed from the field's list, or the field is deleted if it holds a single
+matching value. A value matches if it is equal to `value` or is a reference
+whose `ref` is equal to `value`."""
+FieldDeletion.__new__.__defaults__ = (None,)
+
+DeleteResult = namedtuple(
+    "DeleteResult", ["uri", "deleted", "status_code", "data"])
+"""namedtuple: The outcome of a deletion.
+
+In dry-run mode, `deleted` is False and `data` describes what would happen."""
+
+RECORD_TYPE_LEVELS = {
+    "archival_objects": 0,
+    "digital_object_components": 0,
+    "accessions": 1,
+    "classification_terms": 1,
+    "digital_objects": 1,
+    "resources": 1,
+    "classifications": 2,
+    "repositories": 3,
+}
+"""dict: The order in which record types are deleted. Record types which are
+not listed are deleted at level 2, after the records which may link to them."""
+
+NESTED_TYPES = ["archival_objects", "classification_terms",
+                "digital_object_components"]
+"""list: Record types whose records can be children of records of the same
+type. Within their level they are deleted deepest first."""
+
+
+def remove_field_values(data, deletions):
+    """Removes field values from a record's JSON data.
+
+    :param dict data: the record's JSON data.
+    :param list deletions: the FieldDeletions to apply.
+
+    :returns: the changed JSON data.
+    :rtype: dict
+    """
+    for deletion in deletions:
+        value = data.get(deletion.field)
+        if deletion.value is None or (
+                deletion.field in data and not isinstance(value, list)
+                and _matches(value, deletion.value)):
+            data.pop(deletion.field, None)
+        elif isinstance(value, list):
+            data[deletion.field] = [
+                item for item in value if not _matches(item, deletion.value)]
+    return data
+
+
+def _matches(item, value):
+    return item == value or (isinstance(item, dict) and item.get("ref") == value)
+
+
+def _record_type(uri):
+    parts = [p for p in uri.strip("/").split("/") if not p.isdigit()]
+    return parts[-1] if parts else None
+
+
+def record_type_level(uri):
+    """Returns the dependency level of the record type of a URI.
+
+    :param str uri: an ArchivesSpace URI.
+
+    :rtype: int
+    """
+    return RECORD_TYPE_LEVELS.get(_record_type(uri), 2)
+
+
+class BulkDeleter:
+    """Deletes ArchivesSpace records and field values concurrently."""
+
+    def __init__(self, client=None, max_workers=4, dry_run=False):
+        """Sets initial attributes for the deleter.
+
+        :param ASnakeClient client: the client used to make requests. Defaults
+                to the ArchivesSnake default client.
+        :param int max_workers: the maximum number of concurrent requests.
+        :param bool dry_run: if True, report what would be deleted without
+                changing any data.
+        """
+        self.client = client or JSONModelObject.default_client()
+        self.max_workers = max_workers
+        self.dry_run = dry_run
+
+    def delete(self, targets):
+        """Deletes records and field values.
+
+        Field values are deleted first, grouped so each record is fetched and
+        saved once. Field deletions for records which are themselves being
+        deleted are skipped. Records are then deleted one dependency level at
+        a time, concurrently within each level.
+
+        :param targets: URIs of records to delete, and FieldDeletions.
+        :type targets: iterable of str or FieldDeletion
+
+        :yields: the result of each deletion.
+        :yield type: DeleteResult
+        """
+        uris = OrderedDict()
+        field_deletions = OrderedDict()
+        for target in targets:
+            if isinstance(target, FieldDeletion):
+                field_deletions.setdefault(target.uri, []).append(target)
+            else:
+                uris[target] = None
+        for uri in uris:
+            field_deletions.pop(uri, None)
+        yield from self.delete_field_values(field_deletions)
+        for level in self.dependency_levels(uris):
+            if self.dry_run:
+                for uri in level:
+                    yield DeleteResult(uri, False, None, "Would delete {}".format(uri))
+            else:
+                yield from stream_map(
+                    self._delete, level, self.max_workers, ordered=False)
+
+    def delete_field_values(self, field_deletions):
+        """Deletes field values, saving each record once.
+
+        :param dict field_deletions: lists of FieldDeletions keyed by URI.
+
+        :yields: the result of each record update.
+        :yield type: DeleteResult
+        """
+        if self.dry_run:
+            for uri, deletions in field_deletions.items():
+                yield DeleteResult(uri, False, None, "Would delete {}".format(
+                    ", ".join(self._describe(d) for d in deletions)))
+            return
+        saver = BulkSaver(self.client, max_workers=self.max_workers)
+        updates = [(uri, lambda data, deletions=deletions: remove_field_values(data, deletions))
+                   for uri, deletions in field_deletions.items()]
+        for result in saver.update(updates):
+            yield DeleteResult(*result)
+
+    def dependency_levels(self, uris):
+        """Groups URIs into levels which can be deleted concurrently.
+
+        Children are placed in earlier levels than their parents. Records of
+        `NESTED_TYPES` are ordered by their depth, deepest first, so a child
+        is never deleted in the same batch as its parent.
+
+        :param uris: URIs of records to delete.
+        :type uris: iterable of str
+
+        :returns: lists of URIs, in the order they should be deleted.
+        :rtype: list
+        """
+        levels = {}
+        nested = []
+        for uri in uris:
+            if _record_type(uri) in NESTED_TYPES:
+                nested.append(uri)
+            else:
+                levels.setdefault((record_type_level(uri), 0), []).append(uri)
+        depths = stream_map(self._depth, nested, self.max_workers)
+        for uri, depth in zip(nested, depths):
+            levels.setdefault((record_type_level(uri), -depth), []).append(uri)
+        return [levels[key] for key in sorted(levels)]
+
+    def _depth(self, uri):
+        """Counts the ancestors of a record, following `parent` references
+        for records which do not list their ancestors."""
+        response = self.client.get(uri)
+        if response.status_code != 200:
+            return 0
+        data = response.json()
+        if "ancestors" in data:
+            return len(data["ancestors"])
+        parent = data.get("parent")
+        return 1 + self._depth(parent["ref"]) if parent else 0
+
+    def _describe(self, deletion):
+        if deletion.value is None:
+            return "field {}".format(deletion.field)
+        return "{} from {}".format(deletion.value, deletion.field)
+
+    def _delete(self, uri):
+        try:
+            response = self.client.delete(uri)
+            content = response.json()
+        except Exception as e:
+            return DeleteResult(uri, False, None, str(e))
+        return DeleteResult(
+            uri, response.status_code == 200, response.status_code, content)
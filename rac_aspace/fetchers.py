@@ -0,0 +1,181 @@
+"""Fetchers
+
+Fetchers resolve streams of ArchivesSpace URIs or JSONModelObjects
+concurrently, using a thread pool over a shared ArchivesSnake client. Requests
+are rate limited per host and retried with exponential backoff, and results can
+be streamed in the order they were requested or as soon as they are available.
+
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import Lock
+import time
+from urllib.parse import urlparse
+
+from asnake.jsonmodel import JSONModelObject, wrap_json_object
+
+
+class FetchError(Exception):
+    """Raised when a URI cannot be fetched after all retries."""
+
+    def __init__(self, uri, status_code):
+        self.uri = uri
+        self.status_code = status_code
+        super().__init__(
+            "Fetching {} failed with status {}".format(uri, status_code))
+
+
+class RateLimiter:
+    """Spaces out requests so no more than `rate` are started per second."""
+
+    def __init__(self, rate):
+        """Sets initial attributes for the rate limiter.
+
+        :param float rate: the maximum number of requests per second.
+        """
+        self.interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = Lock()
+
+    def wait(self):
+        """Blocks until another request may be started."""
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+_rate_limiters = {}
+_rate_limiters_lock = Lock()
+
+
+def get_rate_limiter(host, rate):
+    """Returns the rate limiter shared by all fetchers for a host.
+
+    :param str host: the host to be rate limited.
+    :param float rate: the maximum number of requests per second. Only used
+            when a limiter for the host does not exist yet.
+
+    :rtype: RateLimiter
+    """
+    with _rate_limiters_lock:
+        if host not in _rate_limiters:
+            _rate_limiters[host] = RateLimiter(rate)
+        return _rate_limiters[host]
+
+
+class Fetcher:
+    """Resolves URIs and JSONModelObjects concurrently."""
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    """tuple: HTTP status codes which are retried."""
+
+    def __init__(self, client=None, max_workers=8, rate_limit=None,
+                 retries=3, backoff=0.5):
+        """Sets initial attributes for the fetcher.
+
+        :param ASnakeClient client: the client used to make requests. Defaults
+                to the ArchivesSnake default client.
+        :param int max_workers: the maximum number of concurrent requests.
+        :param float rate_limit: Optional maximum number of requests per second
+                made against the client's host.
+        :param int retries: the number of times a failed request is retried.
+        :param float backoff: the delay in seconds before the first retry,
+                doubled for each subsequent retry.
+        """
+        self.client = client or JSONModelObject.default_client()
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.rate_limiter = None
+        if rate_limit:
+            host = urlparse(self.client.config["baseurl"]).netloc
+            self.rate_limiter = get_rate_limiter(host, rate_limit)
+
+    def get(self, uri, params=None):
+        """Fetches a single URI, retrying failed requests with backoff.
+
+        :param str uri: an ArchivesSpace URI.
+        :param dict params: Optional query parameters.
+
+        :returns: the JSON content of the response.
+        :rtype: dict or list
+        """
+        for attempt in range(self.retries + 1):
+            if self.rate_limiter:
+                self.rate_limiter.wait()
+            try:
+                response = self.client.get(uri, params=params or {})
+            except OSError:
+                if attempt == self.retries:
+                    raise
+                status_code = None
+            else:
+                status_code = response.status_code
+                if status_code == 200:
+                    return response.json()
+                if status_code not in self.RETRY_STATUSES:
+                    break
+            if attempt < self.retries:
+                time.sleep(self.backoff * 2 ** attempt)
+        raise FetchError(uri, status_code)
+
+    def _resolve(self, item):
+        if isinstance(item, JSONModelObject):
+            if not item.is_ref:
+                return item
+            item = item.ref
+        return wrap_json_object(self.get(item), self.client)
+
+    def fetch(self, items, ordered=True):
+        """Resolves a stream of URIs or JSONModelObjects.
+
+        Objects which have already been resolved are returned without
+        making a request.
+
+        :param items: URIs or JSONModelObjects to resolve.
+        :type items: iterable of str or JSONModelObject
+        :param bool ordered: if True, results are yielded in the order of
+                `items`; otherwise they are yielded as they complete.
+
+        :yields: resolved ArchivesSpace objects.
+        :yield type: JSONModelObject
+        """
+        return stream_map(self._resolve, items, self.max_workers, ordered)
+
+
+def stream_map(func, items, max_workers=8, ordered=True):
+    """Applies a function to a stream of items using a thread pool.
+
+    No more than twice `max_workers` items are queued at once, so arbitrarily
+    long streams can be consumed.
+
+    :param callable func: the function to apply to each item.
+    :param iterable items: the items to process.
+    :param int max_workers: the maximum number of concurrent calls.
+    :param bool ordered: if True, results are yielded in the order of
+            `items`; otherwise they are yielded as they complete.
+
+    :yields: the result of each call.
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= max_workers * 2:
+                break
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+            for future in done:
+                yield future.result()
+                for item in items:
+                    pending.append(executor.submit(func, item))
+                    break
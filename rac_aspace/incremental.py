@@ -0,0 +1,141 @@
+"""Incremental
+
+Incremental runners process only the records which have changed since their
+last run, using the `modified_since` parameter of ArchivesSpace index routes,
+and merge the new results into a previously serialized output.
+
+"""
+import json
+import os
+from os.path import basename, dirname, isfile, join
+import time
+
+from asnake.jsonmodel import wrap_json_object
+
+CHECKPOINT_MARGIN = 300
+"""int: Seconds subtracted from the start of each run when it is stored as a
+checkpoint, so that differences between the local and server clocks do not
+cause modified records to be missed."""
+
+
+class IncrementalRunner:
+    """Reprocesses records modified since the last run and merges the results."""
+
+    def __init__(self, client, serializer, checkpoint_path, key="uri"):
+        """Sets initial attributes for the runner.
+
+        :param ASnakeClient client: an ArchivesSnake client.
+        :param BaseSerializer serializer: a serializer for the output file.
+        :param str checkpoint_path: the path of a file in which the time of
+                the last run is stored.
+        :param str key: the column which contains the URI of the record a row
+                belongs to.
+        """
+        self.client = client
+        self.serializer = serializer
+        self.checkpoint_path = checkpoint_path
+        self.key = key
+
+    def load_checkpoint(self):
+        """Returns the time of the last run as a Unix timestamp, or 0."""
+        if not isfile(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path, "r") as f:
+            return json.load(f)["modified_since"]
+
+    def save_checkpoint(self, modified_since):
+        """Stores the time of the current run as a Unix timestamp."""
+        with open(self.checkpoint_path, "w") as f:
+            json.dump({"modified_since": modified_since}, f)
+
+    def changed_uris(self, record_type_uri, modified_since):
+        """Lists records of a type modified since a time.
+
+        :param str record_type_uri: the URI of a record type, for example
+                `/repositories/2/archival_objects`.
+        :param int modified_since: a Unix timestamp, or None to list all
+                records.
+
+        :returns: URIs of the modified records.
+        :rtype: list
+        """
+        record_type_uri = record_type_uri.rstrip("/")
+        params = {"all_ids": True}
+        if modified_since is not None:
+            params["modified_since"] = modified_since
+        ids = self.client.get(record_type_uri, params=params).json()
+        return ["{}/{}".format(record_type_uri, i) for i in ids]
+
+    def run(self, record_type_uri, process, fetcher=None):
+        """Processes modified records and merges the results into the output.
+
+        Rows for records of the type which no longer exist are removed.
+
+        :param str record_type_uri: the URI of a record type, for example
+                `/repositories/2/archival_objects`.
+        :param callable process: a function which receives a JSONModelObject
+                and returns a row, or None if the record should have no row.
+        :param Fetcher fetcher: Optional fetcher used to resolve modified
+                records concurrently.
+
+        :returns: the number of records which were reprocessed.
+        :rtype: int
+        """
+        started = max(0, int(time.time()) - CHECKPOINT_MARGIN)
+        uris = self.changed_uris(record_type_uri, self.load_checkpoint())
+        prefix = record_type_uri.rstrip("/") + "/"
+        current = set(self.changed_uris(record_type_uri, None))
+        if fetcher:
+            records = fetcher.fetch(uris)
+        else:
+            records = (wrap_json_object(self.client.get(uri).json(), self.client)
+                       for uri in uris)
+        rows = {}
+        for uri, record in zip(uris, records):
+            rows[uri] = process(record)
+
+        def is_deleted(uri):
+            return uri.startswith(prefix) and uri not in current
+
+        self.merge(rows, is_deleted)
+        self.save_checkpoint(started)
+        return len(rows)
+
+    def merge(self, rows, is_deleted=None):
+        """Merges rows into the output file.
+
+        Existing rows are streamed through unchanged, rows for changed records
+        are replaced (or removed if their new row is None) and rows for new
+        records are appended. The merged output replaces the old file only once
+        it has been completely written.
+
+        :param dict rows: new rows, or None, keyed by the URI of the record
+                they belong to.
+        :param callable is_deleted: Optional function which receives the URI
+                of an existing row and returns True if the row's record has
+                been deleted, so that the row should be removed.
+        """
+        serializer_class = type(self.serializer)
+        filename = self.serializer.filename
+        temp_filename = join(dirname(filename), "." + basename(filename))
+        if isfile(temp_filename):
+            os.remove(temp_filename)
+        serializer_class(temp_filename).write_data(
+            self._merged_rows(dict(rows), is_deleted))
+        os.replace(temp_filename, filename)
+
+    def _merged_rows(self, remaining, is_deleted):
+        filename = self.serializer.filename
+        if isfile(filename):
+            reader = type(self.serializer)(filename, filemode="r")
+            for row in reader.iter_rows():
+                key = row.get(self.key)
+                if key in remaining:
+                    row = remaining.pop(key)
+                elif is_deleted and is_deleted(key):
+                    continue
+                if row is not None:
+                    yield row
+        for row in remaining.values():
+            if row is not None:
+                yield row
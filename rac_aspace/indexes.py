@@ -0,0 +1,533 @@
+"""Indexes
+
+Indexes are built in a single streaming pass over ArchivesSpace records, and
+answer questions about relationships between records which would otherwise
+require fetching every record for every question.
+
+"""
+from collections import defaultdict
+import json
+import time
+
+from asnake.jsonmodel import JSONModelObject
+
+from .incremental import CHECKPOINT_MARGIN
+
+
+def _split_uri(uri):
+    """Splits a URI into its record type path and integer id."""
+    prefix, _, identifier = uri.rpartition("/")
+    return prefix, int(identifier)
+
+
+class ReferenceIndex:
+    """The set of URIs referenced by linking records.
+
+    Referenced URIs are stored as sets of integer ids grouped by record type
+    path (for example `/repositories/2/top_containers`), which is considerably
+    more compact than storing full URI strings.
+    """
+
+    LINKING_TYPES = ["accessions", "archival_objects", "assessments",
+                     "classifications", "classification_terms",
+                     "digital_objects", "digital_object_components", "events",
+                     "resources", "top_containers"]
+    """list: Repository record types which link to agents, subjects, top
+    containers, locations and digital objects."""
+
+    GLOBAL_LINKING_TYPES = ["/agents/people", "/agents/corporate_entities",
+                            "/agents/families", "/agents/software"]
+    """list: Record types outside repositories which link to other records."""
+
+    ORPHAN_QUERIES = {"top_container": "empty_u_sbool:true"}
+    """dict: Search queries which find unlinked records, keyed by record type."""
+
+    def __init__(self):
+        self._ids = defaultdict(set)
+        self.repositories = set()
+        self.all_repositories = False
+
+    def __contains__(self, uri):
+        try:
+            prefix, identifier = _split_uri(uri)
+        except ValueError:
+            return False
+        return identifier in self._ids.get(prefix, ())
+
+    def __len__(self):
+        return sum(len(ids) for ids in self._ids.values())
+
+    def add(self, record):
+        """Adds all URIs referenced by a record to the index.
+
+        :param record: an ArchivesSpace record.
+        :type record: dict or JSONModelObject
+        """
+        if isinstance(record, JSONModelObject):
+            record = record.json()
+        stack = [record]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, dict):
+                ref = value.get("ref")
+                if isinstance(ref, str):
+                    try:
+                        prefix, identifier = _split_uri(ref)
+                        self._ids[prefix].add(identifier)
+                    except ValueError:
+                        pass
+                stack.extend(value.values())
+            elif isinstance(value, list):
+                stack.extend(value)
+
+    @classmethod
+    def build(cls, client, repository_uri=None, record_types=None):
+        """Builds an index from all linking records in a repository.
+
+        Records are streamed page by page, so only one page is held in memory
+        at a time. If no repository is given, every repository is indexed,
+        along with `GLOBAL_LINKING_TYPES`, so that orphans can be found among
+        record types which are shared across repositories, such as agents.
+
+        :param ASnakeClient client: an ArchivesSnake client.
+        :param str repository_uri: Optional URI of an ArchivesSpace repository.
+                Defaults to all repositories.
+        :param list record_types: Optional record types to index. Defaults to
+                `LINKING_TYPES`.
+
+        :rtype: ReferenceIndex
+        """
+        index = cls()
+        if repository_uri:
+            repository_uris = [repository_uri.rstrip("/")]
+        else:
+            repository_uris = [
+                r["uri"] for r in client.get("/repositories").json()]
+            index.all_repositories = True
+        for uri in repository_uris:
+            for record_type in record_types or cls.LINKING_TYPES:
+                for record in client.get_paged("{}/{}".format(uri, record_type)):
+                    index.add(record)
+            index.repositories.add(uri)
+        if index.all_repositories:
+            for record_type_uri in cls.GLOBAL_LINKING_TYPES:
+                for record in client.get_paged(record_type_uri):
+                    index.add(record)
+        return index
+
+    def orphans(self, uris):
+        """Finds URIs which are not referenced by any indexed record.
+
+        :param uris: URIs of candidate records.
+        :type uris: iterable of str
+
+        :yields: URIs which are not referenced.
+        :yield type: str
+        """
+        for uri in uris:
+            if uri not in self:
+                yield uri
+
+    def find_orphans(self, client, record_type_uri):
+        """Finds unlinked records of a record type.
+
+        Records can only be linked from within their own repository, or from
+        any repository if they are not in one, so the index must have been
+        built from the record type's repository, or from all repositories for
+        record types such as `/agents/people`. Otherwise records linked from
+        unindexed repositories would be reported as orphans.
+
+        :param ASnakeClient client: an ArchivesSnake client.
+        :param str record_type_uri: the URI of a record type, for example
+                `/repositories/2/top_containers` or `/agents/people`.
+
+        :returns: URIs of records which are not referenced.
+        :rtype: list
+        :raises ValueError: if the index does not cover every record which can
+                link to the record type.
+        """
+        record_type_uri = record_type_uri.rstrip("/")
+        if not self.all_repositories:
+            parts = record_type_uri.split("/")
+            if parts[1] != "repositories":
+                raise ValueError(
+                    "{} can be linked from any repository; build the index "
+                    "from all repositories to find its orphans.".format(
+                        record_type_uri))
+            if "/".join(parts[:3]) not in self.repositories:
+                raise ValueError("{} is not in an indexed repository.".format(
+                    record_type_uri))
+        ids = client.get(record_type_uri, params={"all_ids": True}).json()
+        return list(self.orphans(
+            "{}/{}".format(record_type_uri, i) for i in ids))
+
+
+def search_orphans(client, repository_uri, record_type, query=None):
+    """Finds unlinked records using the ArchivesSpace search API.
+
+    Records are filtered by the server, so only the URIs of orphans are
+    transferred.
+
+    :param ASnakeClient client: an ArchivesSnake client.
+    :param str repository_uri: the URI of an ArchivesSpace repository.
+    :param str record_type: the record type to search, for example
+            `top_container`.
+    :param str query: Optional search query which matches unlinked records.
+            Defaults to a known query for the record type.
+
+    :yields: URIs of unlinked records.
+    :yield type: str
+    """
+    query = query or ReferenceIndex.ORPHAN_QUERIES.get(record_type)
+    if not query:
+        raise ValueError(
+            "No orphan query is known for {}.".format(record_type))
+    for result in client.get_paged(
+            "{}/search".format(repository_uri.rstrip("/")),
+            params={"q": query, "type": [record_type], "fields": ["uri"]}):
+        yield result["uri"]
+
+
+def _ref(value):
+    """Returns the URI a ref points to, for dicts and JSONModelObjects."""
+    if isinstance(value, JSONModelObject):
+        value = value._json
+    return value.get("ref") or value.get("uri")
+
+
+class LocationIndex:
+    """An inverted index from locations to top containers and archival objects.
+
+    Answers questions such as "which archival objects are on this shelf" or
+    "which top containers are in this building" without fetching any records.
+    Only current container locations are indexed.
+    """
+
+    LOCATION_FIELDS = ["building", "floor", "room", "area", "barcode",
+                       "classification"]
+    """list: Location fields which locations can be looked up by."""
+
+    def __init__(self):
+        self._containers = defaultdict(set)
+        self._objects = defaultdict(set)
+        self._locations = {}
+        self._by_field = defaultdict(set)
+
+    def __len__(self):
+        return len(self._containers)
+
+    def add_archival_object(self, archival_object):
+        """Adds the top containers of an archival object's instances.
+
+        :param archival_object: an ArchivesSpace archival_object.
+        :type archival_object: dict or JSONModelObject
+        """
+        if isinstance(archival_object, JSONModelObject):
+            archival_object = archival_object._json
+        for instance in archival_object.get("instances", []):
+            sub_container = instance.get("sub_container")
+            if sub_container:
+                self._objects[_ref(sub_container["top_container"])].add(
+                    archival_object["uri"])
+
+    def add_top_container(self, top_container):
+        """Adds the current locations of a top container.
+
+        :param top_container: an ArchivesSpace top_container.
+        :type top_container: dict or JSONModelObject
+        """
+        if isinstance(top_container, JSONModelObject):
+            top_container = top_container._json
+        for container_location in top_container.get("container_locations", []):
+            if container_location.get("status", "current") == "current":
+                self._containers[container_location["ref"]].add(
+                    top_container["uri"])
+                if "_resolved" in container_location:
+                    self.add_location(container_location["_resolved"])
+
+    def add_location(self, location):
+        """Adds the fields of a location, so it can be looked up by them.
+
+        :param location: an ArchivesSpace location.
+        :type location: dict or JSONModelObject
+        """
+        if isinstance(location, JSONModelObject):
+            location = location._json
+        fields = {field: location[field] for field in self.LOCATION_FIELDS
+                  if location.get(field)}
+        self._remove_fields(location["uri"])
+        self._locations[location["uri"]] = fields
+        for field, value in fields.items():
+            self._by_field[(field, value)].add(location["uri"])
+
+    def _remove_fields(self, location_uri):
+        for field, value in self._locations.get(location_uri, {}).items():
+            self._by_field[(field, value)].discard(location_uri)
+
+    @classmethod
+    def build(cls, client, repository_uri):
+        """Builds an index for a repository.
+
+        Archival objects, top containers and locations are each streamed page
+        by page in a single pass.
+
+        :param ASnakeClient client: an ArchivesSnake client.
+        :param str repository_uri: the URI of an ArchivesSpace repository.
+
+        :rtype: LocationIndex
+        """
+        index = cls()
+        repository_uri = repository_uri.rstrip("/")
+        for archival_object in client.get_paged(
+                "{}/archival_objects".format(repository_uri)):
+            index.add_archival_object(archival_object)
+        for top_container in client.get_paged(
+                "{}/top_containers".format(repository_uri)):
+            index.add_top_container(top_container)
+        for location in client.get_paged("/locations"):
+            index.add_location(location)
+        return index
+
+    def locations(self, **fields):
+        """Finds locations matching all of the given field values.
+
+        :param fields: location field values, for example `building="Main"`.
+                If none are given, all locations with containers are returned.
+
+        :returns: location URIs.
+        :rtype: set
+        """
+        if not fields:
+            return set(self._containers)
+        matches = [self._by_field.get((field, value), set())
+                   for field, value in fields.items()]
+        return set.intersection(*matches)
+
+    def containers_at(self, *location_uris):
+        """Finds top containers at one or more locations.
+
+        :returns: top container URIs.
+        :rtype: set
+        """
+        return set().union(*(self._containers.get(uri, ())
+                             for uri in location_uris))
+
+    def objects_at(self, *location_uris):
+        """Finds archival objects at one or more locations.
+
+        :returns: archival object URIs.
+        :rtype: set
+        """
+        return set().union(*(self._objects.get(uri, ())
+                             for uri in self.containers_at(*location_uris)))
+
+    def containers_where(self, **fields):
+        """Finds top containers at locations matching the given field values.
+
+        :rtype: set
+        """
+        return self.containers_at(*self.locations(**fields))
+
+    def objects_where(self, **fields):
+        """Finds archival objects at locations matching the given field values,
+        for example `objects_where(building="Main", floor="2")`.
+
+        :rtype: set
+        """
+        return self.objects_at(*self.locations(**fields))
+
+    def save(self, path):
+        """Writes the index to a JSON file.
+
+        :param str path: the path of the file.
+        """
+        with open(path, "w") as f:
+            json.dump({
+                "containers": {k: sorted(v) for k, v in self._containers.items()},
+                "objects": {k: sorted(v) for k, v in self._objects.items()},
+                "locations": self._locations,
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        """Reads an index from a JSON file written by :meth:`save`.
+
+        :param str path: the path of the file.
+
+        :rtype: LocationIndex
+        """
+        with open(path, "r") as f:
+            data = json.load(f)
+        index = cls()
+        for location_uri, container_uris in data["containers"].items():
+            index._containers[location_uri].update(container_uris)
+        for container_uri, object_uris in data["objects"].items():
+            index._objects[container_uri].update(object_uris)
+        for location_uri, fields in data["locations"].items():
+            index.add_location(dict(fields, uri=location_uri))
+        return index
+
+
+def _identifier_parts(resource):
+    """Returns the four-part ID of a resource as a tuple, up to the first
+    missing part."""
+    parts = []
+    for x in range(4):
+        part = resource.get("id_{0}".format(x))
+        if not part:
+            break
+        parts.append(part)
+    return tuple(parts)
+
+
+class ResourceIdentifierIndex:
+    """Maps formatted resource identifiers to resource URIs and back.
+
+    Identifiers are stored as tuples of their parts, so they can be formatted
+    with any separator. Lookups by formatted identifier use the separator the
+    index was created with.
+    """
+
+    def __init__(self, separator=":"):
+        """Sets initial attributes for the index.
+
+        :param str separator: the separator between the id parts of formatted
+                identifiers. Defaults to `:`.
+        """
+        self.separator = separator
+        self.modified_since = {}
+        self._parts = {}
+        self._uris = {}
+
+    def __len__(self):
+        return len(self._parts)
+
+    def __contains__(self, uri):
+        return uri in self._parts
+
+    def add(self, resource):
+        """Adds or replaces the identifier of a resource.
+
+        :param resource: an ArchivesSpace resource.
+        :type resource: dict or JSONModelObject
+        """
+        if isinstance(resource, JSONModelObject):
+            resource = resource._json
+        uri = resource["uri"]
+        self.remove(uri)
+        parts = _identifier_parts(resource)
+        self._parts[uri] = parts
+        self._uris[self.separator.join(parts)] = uri
+
+    def remove(self, uri):
+        """Removes a resource from the index, if it is present.
+
+        :param str uri: the URI of the resource.
+        """
+        parts = self._parts.pop(uri, None)
+        if parts is not None:
+            identifier = self.separator.join(parts)
+            if self._uris.get(identifier) == uri:
+                del self._uris[identifier]
+
+    @classmethod
+    def build(cls, client, repository_uri, separator=":"):
+        """Builds an index from all resources in a repository.
+
+        :param ASnakeClient client: an ArchivesSnake client.
+        :param str repository_uri: the URI of an ArchivesSpace repository.
+        :param str separator: the separator between id parts.
+
+        :rtype: ResourceIdentifierIndex
+        """
+        index = cls(separator)
+        repository_uri = repository_uri.rstrip("/")
+        started = max(0, int(time.time()) - CHECKPOINT_MARGIN)
+        for resource in client.get_paged("{}/resources".format(repository_uri)):
+            index.add(resource)
+        index.modified_since[repository_uri] = started
+        return index
+
+    def refresh(self, client, repository_uri, fetcher=None):
+        """Updates the index with resources changed since it was last built
+        or refreshed.
+
+        Resources modified since then are refetched, and resources which no
+        longer exist are removed.
+
+        :param ASnakeClient client: an ArchivesSnake client.
+        :param str repository_uri: the URI of an ArchivesSpace repository.
+        :param Fetcher fetcher: Optional fetcher used to refetch modified
+                resources concurrently.
+
+        :returns: the number of resources which were updated or removed.
+        :rtype: int
+        """
+        repository_uri = repository_uri.rstrip("/")
+        resources_uri = "{}/resources".format(repository_uri)
+        started = max(0, int(time.time()) - CHECKPOINT_MARGIN)
+        modified = ["{}/{}".format(resources_uri, i) for i in client.get(
+            resources_uri, params={
+                "all_ids": True,
+                "modified_since": self.modified_since.get(repository_uri, 0)}
+        ).json()]
+        if fetcher:
+            resources = fetcher.fetch(modified)
+        else:
+            resources = (client.get(uri).json() for uri in modified)
+        for resource in resources:
+            self.add(resource)
+        current = set("{}/{}".format(resources_uri, i) for i in client.get(
+            resources_uri, params={"all_ids": True}).json())
+        deleted = [uri for uri in self._parts
+                   if uri.startswith(resources_uri + "/") and uri not in current]
+        for uri in deleted:
+            self.remove(uri)
+        self.modified_since[repository_uri] = started
+        return len(modified) + len(deleted)
+
+    def uri(self, identifier):
+        """Finds the URI of a resource by its formatted identifier.
+
+        :param str identifier: an identifier formatted with the index's
+                separator, for example `FA123:2`.
+
+        :returns: the resource URI, or None if no resource has the identifier.
+        :rtype: str
+        """
+        return self._uris.get(identifier)
+
+    def identifier(self, uri, separator=None):
+        """Formats the identifier of a resource.
+
+        :param str uri: the URI of the resource.
+        :param str separator: Optional separator between id parts. Defaults to
+                the index's separator.
+
+        :returns: the formatted identifier, or None if the resource is not
+                indexed.
+        :rtype: str
+        """
+        parts = self._parts.get(uri)
+        if parts is None:
+            return None
+        return (self.separator if separator is None else separator).join(parts)
+
+    def identifiers(self, uris=None, separator=None):
+        """Formats the identifiers of many resources.
+
+        :param uris: Optional URIs of resources. Defaults to all indexed
+                resources.
+        :type uris: iterable of str
+        :param str separator: Optional separator between id parts. Defaults to
+                the index's separator.
+
+        :returns: formatted identifiers keyed by URI. Resources which are not
+                indexed are omitted.
+        :rtype: dict
+        """
+        separator = self.separator if separator is None else separator
+        parts = self._parts
+        if uris is None:
+            uris = parts
+        return {uri: separator.join(parts[uri]) for uri in uris if uri in parts}
@@ -0,0 +1,210 @@
+"""Instrumentation
+
+Instrumentation records where the time of a job goes: call counts and wall
+time for data helpers and serializers, counts, bytes and time of HTTP requests,
+and hits and misses of caches. Recording only happens inside an
+:class:`Instrumentation` block, and costs a single check per helper call when
+no block is active. Times are inclusive, so the time of a helper includes the
+time of any helpers it calls.
+
+Helpers decorated with :func:`rac_aspace.decorators.check_type` are timed by
+the type-checking wrapper, so they are not timed when type checks are disabled
+with the `RAC_ASPACE_SKIP_TYPE_CHECKS` environment variable. HTTP requests are
+only recorded for clients passed to :func:`instrument_client`.
+
+"""
+import json
+from threading import Lock
+import time
+from types import GeneratorType
+
+ACTIVE = []
+"""list: The Instrumentation blocks which are currently recording."""
+
+
+class Instrumentation:
+    """Records helper calls, HTTP requests and cache lookups.
+
+    Use as a context manager; everything which happens inside the block is
+    recorded, including work done in other threads. Blocks may be nested, in
+    which case the outer blocks also record everything recorded by the inner
+    ones.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.requests = {}
+        self.caches = {}
+        self.elapsed = 0
+        self._started = None
+        self._lock = Lock()
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        ACTIVE.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        ACTIVE.remove(self)
+        self.elapsed += time.perf_counter() - self._started
+
+    def record_call(self, name, seconds):
+        """Counts a call and adds its wall time."""
+        with self._lock:
+            totals = self.calls.setdefault(name, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+    def record_time(self, name, seconds):
+        """Adds time to a call without counting another call."""
+        with self._lock:
+            self.calls.setdefault(name, [0, 0.0])[1] += seconds
+
+    def record_request(self, method, size, seconds):
+        """Counts an HTTP request and adds its size in bytes and duration."""
+        with self._lock:
+            totals = self.requests.setdefault(method, [0, 0, 0.0])
+            totals[0] += 1
+            totals[1] += size
+            totals[2] += seconds
+
+    def record_cache(self, name, hit):
+        """Counts a cache hit or miss."""
+        with self._lock:
+            self.caches.setdefault(name, [0, 0])[0 if hit else 1] += 1
+
+    def summary(self):
+        """Summarizes everything recorded so far.
+
+        :returns: the elapsed time of the block, and call, request and cache
+                statistics keyed by name.
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                "elapsed": self.elapsed,
+                "calls": {name: {"count": count, "seconds": seconds}
+                          for name, (count, seconds) in self.calls.items()},
+                "requests": {
+                    method: {"count": count, "bytes": size, "seconds": seconds}
+                    for method, (count, size, seconds) in self.requests.items()},
+                "caches": {name: {"hits": hits, "misses": misses}
+                           for name, (hits, misses) in self.caches.items()},
+            }
+
+    def to_json(self, path=None):
+        """Exports the summary as JSON.
+
+        :param str path: Optional path of a file to write the JSON to.
+
+        :returns: the JSON summary.
+        :rtype: str
+        """
+        data = json.dumps(self.summary(), indent=2, sort_keys=True)
+        if path:
+            with open(path, "w") as f:
+                f.write(data)
+        return data
+
+    def report(self):
+        """Formats the summary as a human-readable table.
+
+        Calls are sorted by total time, slowest first.
+
+        :rtype: str
+        """
+        summary = self.summary()
+        lines = ["Elapsed: {:.3f}s".format(summary["elapsed"]), "",
+                 "{:<45} {:>10} {:>12}".format("Call", "Count", "Seconds")]
+        for name, stats in sorted(summary["calls"].items(),
+                                  key=lambda item: -item[1]["seconds"]):
+            lines.append("{:<45} {:>10} {:>12.3f}".format(
+                name, stats["count"], stats["seconds"]))
+        lines += ["", "{:<10} {:>10} {:>14} {:>12}".format(
+            "Request", "Count", "Bytes", "Seconds")]
+        for method, stats in sorted(summary["requests"].items()):
+            lines.append("{:<10} {:>10} {:>14} {:>12.3f}".format(
+                method, stats["count"], stats["bytes"], stats["seconds"]))
+        lines += ["", "{:<45} {:>10} {:>10}".format("Cache", "Hits", "Misses")]
+        for name, stats in sorted(summary["caches"].items()):
+            lines.append("{:<45} {:>10} {:>10}".format(
+                name, stats["hits"], stats["misses"]))
+        return "\n".join(lines)
+
+
+def call_name(func):
+    """Returns the name a function's calls are recorded under."""
+    module = func.__module__ or ""
+    if module.startswith("rac_aspace."):
+        module = module[len("rac_aspace."):]
+    return "{}.{}".format(module, func.__qualname__)
+
+
+def timed_call(name, func, args, kwargs):
+    """Calls a function, recording its wall time in all active blocks.
+
+    If the function returns a generator, the time spent producing each item
+    is recorded as well.
+    """
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    seconds = time.perf_counter() - started
+    for instrumentation in list(ACTIVE):
+        instrumentation.record_call(name, seconds)
+    if isinstance(result, GeneratorType):
+        return _timed_iter(name, result)
+    return result
+
+
+def _timed_iter(name, iterator):
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            seconds = time.perf_counter() - started
+            for instrumentation in list(ACTIVE):
+                instrumentation.record_time(name, seconds)
+        yield item
+
+
+def record_cache(name, hit):
+    """Records a cache lookup in all active blocks.
+
+    :param str name: the name of the cache.
+    :param bool hit: whether the lookup was a hit.
+    """
+    for instrumentation in list(ACTIVE):
+        instrumentation.record_cache(name, hit)
+
+
+def _record_response(response, *args, **kwargs):
+    if ACTIVE:
+        size = len(response.content or b"")
+        seconds = response.elapsed.total_seconds()
+        for instrumentation in list(ACTIVE):
+            instrumentation.record_request(
+                response.request.method, size, seconds)
+    return response
+
+
+def instrument_client(client):
+    """Records the HTTP requests made by an ArchivesSnake client.
+
+    Adds a response hook to the client's session, so only requests which
+    actually reach the network are recorded; responses served from a
+    :class:`rac_aspace.cache.CachingClient` are recorded as cache hits instead.
+    Calling this more than once for the same client has no further effect.
+
+    :param ASnakeClient client: an ArchivesSnake client, or a wrapper around
+            one such as a CachingClient.
+
+    :returns: the client.
+    :rtype: ASnakeClient
+    """
+    hooks = client.session.hooks["response"]
+    if _record_response not in hooks:
+        hooks.append(_record_response)
+    return client
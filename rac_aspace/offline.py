@@ -0,0 +1,172 @@
+"""Offline
+
+An offline backend which serves records from a newline-delimited JSON dump
+instead of the ArchivesSpace API. The dump is scanned once to build an index
+of the byte offsets of records by URI, and records are read lazily from the
+file, which is memory-mapped by default. An :class:`OfflineClient` can be used
+wherever an ArchivesSnake client is expected, so data helpers, fetchers and
+JSONModelObjects resolve refs from the snapshot without any network access.
+
+"""
+import json
+import mmap
+from os.path import abspath, getsize
+from threading import Lock
+
+from asnake.jsonmodel import wrap_json_object
+
+from .cache import CachedResponse, _normalize_uri
+
+
+def _is_record_type(uri):
+    """Checks whether a URI names a record type, such as `/agents/people` or
+    `/repositories/2/archival_objects`, rather than a record or a route below
+    a record."""
+    parts = uri.strip("/").split("/")
+    if parts[0] == "repositories" and len(parts) > 2:
+        parts = parts[2:]
+    return bool(parts[0]) and not any(part.isdigit() for part in parts)
+
+
+class OfflineResponse(CachedResponse):
+    """A minimal stand-in for a `requests.Response` served from a dump."""
+
+    def __init__(self, text, status_code=200):
+        super().__init__(text)
+        self.status_code = status_code
+
+
+class OfflineClient:
+    """Serves ArchivesSpace records from a newline-delimited JSON dump.
+
+    Supports requests for single records by URI, `id_set` requests for
+    several records of a type, `all_ids` requests for the ids of a record type
+    and paged requests for all records of a type. Record types with no records
+    in the dump list no ids. All other requests for URIs which are not in the
+    dump, such as routes below a record, receive a 404 response, so that
+    JSONModelObjects raise AttributeError for missing fields as they do
+    online.
+    """
+
+    def __init__(self, path, memory_map=True):
+        """Indexes the dump.
+
+        :param str path: the path of a file containing one JSON record per
+                line. Records without a `uri` are skipped.
+        :param bool memory_map: if True, records are read from a memory map of
+                the file. Otherwise they are read with seeks.
+        """
+        self.path = path
+        self.config = {"baseurl": "file://" + abspath(path)}
+        self._offsets = {}
+        self._lock = Lock()
+        self._file = open(path, "rb")
+        for offset, line in self._scan():
+            uri = json.loads(line).get("uri")
+            if uri:
+                self._offsets[_normalize_uri(uri)] = (offset, len(line))
+        self._map = None
+        if memory_map and getsize(path):
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _scan(self):
+        offset = 0
+        for line in self._file:
+            if line.strip():
+                yield offset, line
+            offset += len(line)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __contains__(self, uri):
+        return _normalize_uri(uri) in self._offsets
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Closes the dump file."""
+        if self._map:
+            self._map.close()
+        self._file.close()
+
+    def uris(self):
+        """Returns the URIs of all records in the dump.
+
+        :rtype: list
+        """
+        return list(self._offsets)
+
+    def get_text(self, uri):
+        """Returns the JSON text of a record.
+
+        :param str uri: an ArchivesSpace URI.
+
+        :returns: the JSON text, or None if the record is not in the dump.
+        :rtype: str
+        """
+        try:
+            offset, length = self._offsets[_normalize_uri(uri)]
+        except KeyError:
+            return None
+        if self._map:
+            data = self._map[offset:offset + length]
+        else:
+            with self._lock:
+                self._file.seek(offset)
+                data = self._file.read(length)
+        return data.decode("utf-8")
+
+    def get_object(self, uri):
+        """Returns a record as a JSONModelObject bound to this client.
+
+        :param str uri: an ArchivesSpace URI.
+
+        :returns: the record, or None if it is not in the dump.
+        :rtype: JSONModelObject
+        """
+        text = self.get_text(uri)
+        return wrap_json_object(json.loads(text), self) if text else None
+
+    def get(self, uri, params=None, **kwargs):
+        params = params or {}
+        uri = _normalize_uri(uri).rstrip("/")
+        id_set = params.get("id_set", params.get("id_set[]"))
+        if id_set is not None:
+            texts = [self.get_text("{}/{}".format(uri, i)) for i in id_set]
+            return OfflineResponse(
+                "[{}]".format(",".join(text for text in texts if text)))
+        if params.get("all_ids") and _is_record_type(uri):
+            return OfflineResponse(json.dumps(self._ids(uri)))
+        text = self.get_text(uri)
+        if text is None:
+            return OfflineResponse(json.dumps({"error": "Record not found"}), 404)
+        return OfflineResponse(text)
+
+    def get_paged(self, uri, params=None, **kwargs):
+        """Yields all records of a record type, in order of their ids.
+
+        :param str uri: the URI of a record type, for example `/locations`.
+
+        :yields: the JSON of each record.
+        :yield type: dict
+        """
+        uri = _normalize_uri(uri).rstrip("/")
+        if _is_record_type(uri):
+            for i in self._ids(uri):
+                yield json.loads(self.get_text("{}/{}".format(uri, i)))
+
+    def _ids(self, record_type_uri):
+        prefix = record_type_uri + "/"
+        return sorted(int(u[len(prefix):]) for u in self._offsets
+                      if u.startswith(prefix) and u[len(prefix):].isdigit())
+
+    def post(self, uri, *args, **kwargs):
+        raise TypeError("OfflineClient is read-only")
+
+    def delete(self, uri, *args, **kwargs):
+        raise TypeError("OfflineClient is read-only")
@@ -0,0 +1,105 @@
+"""Pipelines
+
+Pipelines run data helpers over streams of archival object JSON using a pool
+of worker processes, so CPU-bound work such as parsing notes and fuzzy matching
+can use every core. Records are sent to workers in chunks to keep pickling
+overhead low, and rows are streamed back in the order of the input, ready to be
+written by a serializer.
+
+"""
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool, cpu_count
+from types import GeneratorType
+
+_fields = None
+
+
+def _init_worker(fields):
+    global _fields
+    _fields = fields
+
+
+def _process_chunk(chunk, fields=None):
+    """Builds a row for each record in a chunk."""
+    rows = []
+    for record in chunk:
+        row = {}
+        for name, func in fields or _fields:
+            value = func(record)
+            if isinstance(value, GeneratorType):
+                value = list(value)
+            row[name] = value
+        rows.append(row)
+    return rows
+
+
+class Pipeline:
+    """Applies a chain of data helpers to archival objects in parallel.
+
+    Each field of the pipeline is a pair of a column name and a function which
+    receives an archival object's JSON and returns the value of that column.
+    Functions are sent to worker processes, so they must be picklable: use
+    module-level functions, or :func:`functools.partial` to supply additional
+    arguments, for example
+    `("restricted", partial(is_restricted, query_string="closed", restriction_acts=["disallow"]))`.
+    Generators returned by functions such as :func:`iter_note_text` are
+    converted to lists.
+    """
+
+    def __init__(self, fields, processes=None, chunk_size=500):
+        """Sets initial attributes for the pipeline.
+
+        :param list fields: pairs of a column name and a function.
+        :param int processes: the number of worker processes. Defaults to the
+                number of CPUs. If 1, records are processed in the current
+                process.
+        :param int chunk_size: the number of records sent to a worker at once.
+        """
+        self.fields = list(fields)
+        self.processes = processes or cpu_count()
+        self.chunk_size = chunk_size
+
+    @property
+    def fieldnames(self):
+        """list: The column names of the rows produced by the pipeline."""
+        return [name for name, _ in self.fields]
+
+    def run(self, records):
+        """Processes a stream of archival objects.
+
+        No more than twice as many chunks as there are processes are queued at
+        once, so arbitrarily long streams can be consumed.
+
+        :param records: ArchivesSpace archival_objects.
+        :type records: iterable of dict
+
+        :yields: a row for each archival object, in the order of `records`.
+        :yield type: dict
+        """
+        records = iter(records)
+        chunks = iter(lambda: list(islice(records, self.chunk_size)), [])
+        if self.processes == 1:
+            for chunk in chunks:
+                yield from _process_chunk(chunk, self.fields)
+            return
+        with Pool(self.processes, _init_worker, (self.fields,)) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.apply_async(_process_chunk, (chunk,)))
+                if len(pending) >= self.processes * 2:
+                    yield from pending.popleft().get()
+            while pending:
+                yield from pending.popleft().get()
+
+    def write(self, records, serializer):
+        """Processes a stream of archival objects and serializes the rows.
+
+        :param records: ArchivesSpace archival_objects.
+        :type records: iterable of dict
+        :param BaseSerializer serializer: the serializer to write rows with.
+
+        :returns: the number of rows written.
+        :rtype: int
+        """
+        return serializer.write_data(self.run(records), fieldnames=self.fieldnames)
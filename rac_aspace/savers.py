@@ -0,0 +1,138 @@
+"""Savers
+
+Savers push new or updated JSON data back to ArchivesSpace. Updates are posted
+with bounded concurrency, stale `lock_version` conflicts are resolved by
+refetching the record and reapplying the change, and results are streamed back
+as they complete so that one failure does not stop a bulk job.
+
+"""
+from collections import namedtuple
+from copy import deepcopy
+
+from asnake.jsonmodel import JSONModelObject
+
+from .fetchers import stream_map
+
+SaveResult = namedtuple("SaveResult", ["uri", "saved", "status_code", "data"])
+"""namedtuple: The outcome of saving a record.
+
+`data` contains the JSON response from ArchivesSpace, or an error message if
+the request could not be made."""
+
+
+def editable_json(record):
+    """Returns a copy of a record which is safe to edit.
+
+    :param record: an ArchivesSpace record.
+    :type record: dict or JSONModelObject
+
+    :returns: the record's JSON data.
+    :rtype: dict
+    """
+    if isinstance(record, JSONModelObject):
+        return record.json()
+    return deepcopy(record)
+
+
+def apply_change(data, change):
+    """Applies a change to a record's JSON data.
+
+    :param dict data: the record's JSON data.
+    :param change: a dict of values to set, or a callable which receives the
+            JSON data and either edits it in place or returns new JSON data.
+    :type change: dict or callable
+
+    :returns: the changed JSON data.
+    :rtype: dict
+    """
+    if callable(change):
+        changed = change(data)
+        return data if changed is None else changed
+    data.update(deepcopy(change))
+    return data
+
+
+class BulkSaver:
+    """Creates and updates ArchivesSpace records concurrently."""
+
+    def __init__(self, client=None, max_workers=4, conflict_retries=3):
+        """Sets initial attributes for the saver.
+
+        :param ASnakeClient client: the client used to make requests. Defaults
+                to the ArchivesSnake default client.
+        :param int max_workers: the maximum number of concurrent requests.
+        :param int conflict_retries: the number of times a record is refetched
+                and the change reapplied after a `lock_version` conflict.
+        """
+        self.client = client or JSONModelObject.default_client()
+        self.max_workers = max_workers
+        self.conflict_retries = conflict_retries
+
+    def update(self, updates):
+        """Applies changes to existing records and saves them.
+
+        If a record has been modified since it was fetched, the record is
+        refetched and the change is applied to the current version.
+
+        :param updates: pairs of a record and a change, as accepted by
+                :func:`apply_change`. Records may be JSONModelObjects, dicts
+                or URIs; URIs are fetched before the change is applied.
+        :type updates: iterable of tuple
+
+        :yields: the result of each update, in the order they complete.
+        :yield type: SaveResult
+        """
+        return stream_map(
+            self._update, updates, self.max_workers, ordered=False)
+
+    def create(self, records, uri):
+        """Creates new records.
+
+        :param records: the JSON data for each new record.
+        :type records: iterable of dict
+        :param str uri: the URI to post new records to, for example
+                `/repositories/2/archival_objects`.
+
+        :yields: the result of each request, in the order they complete.
+        :yield type: SaveResult
+        """
+        return stream_map(
+            lambda record: self._post(uri, editable_json(record)),
+            records, self.max_workers, ordered=False)
+
+    def _update(self, update):
+        record, change = update
+        if isinstance(record, str):
+            uri, data = record, None
+        else:
+            data = editable_json(record)
+            uri = data.get("uri")
+        try:
+            for _ in range(self.conflict_retries + 1):
+                if data is None:
+                    data = self._fetch(uri)
+                result = self._post(uri, apply_change(data, change))
+                if result.status_code != 409:
+                    break
+                data = None
+            return result
+        except Exception as e:
+            return SaveResult(uri, False, None, str(e))
+
+    def _fetch(self, uri):
+        response = self.client.get(uri)
+        if response.status_code != 200:
+            raise Exception("Could not fetch {}: status {}".format(
+                uri, response.status_code))
+        return response.json()
+
+    def _post(self, uri, data):
+        try:
+            response = self.client.post(uri, json=data)
+            content = response.json()
+        except Exception as e:
+            return SaveResult(uri, False, None, str(e))
+        saved = response.status_code == 200
+        if saved:
+            uri = content.get("uri", uri)
+        return SaveResult(uri, saved, response.status_code, content)
@@ -1,4 +1,31 @@
+import bz2
 import csv
+import gzip
+from itertools import chain, islice
+import lzma
+import mmap
+from os.path import getsize, isfile, join, split
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+from .decorators import instrumented
+
+COMPRESSIONS = {
+    "gz": gzip.open,
+    "bz2": bz2.open,
+    "xz": lzma.open,
+    "zst": zstandard.open if zstandard else None,
+}
+"""dict: Functions which open compressed files, keyed by filename extension."""
 
 
 class BaseSerializer:
@@ -8,45 +35,142 @@ class BaseSerializer:
 
         Ensures that a filemode is provided which supports write operations, and
         replaces the filename extension if it does not match the extension
-        specified by the class.
+        specified by the class. Filenames ending in a compression extension
+        such as `.gz` or `.zst` are read and written with that compression.
 
         :param str filename: a filename at which the data should be serialized.
         :param str filemode: Optional argument used when opening files.
         """
         self.filemode = filemode
-        extension = filename.split(".")[-1]
-        if extension != self.extension:
-            if len(filename.split(".")) > 1:
-                filename = filename[:-len(extension)] + self.extension
-            else:
-                filename = "{}.{}".format(filename, self.extension)
-        self.filename = filename
-
-    def write_data(self, data):
+        self.compression = None
+        directory, basename = split(filename)
+        parts = basename.split(".")
+        if len(parts) > 1 and parts[-1] in COMPRESSIONS:
+            self.compression = parts.pop()
+            if not COMPRESSIONS[self.compression]:
+                raise ImportError(
+                    "zstandard is required for {} files.".format(self.compression))
+        if len(parts) > 1:
+            parts[-1] = self.extension
+        else:
+            parts.append(self.extension)
+        if self.compression:
+            parts.append(self.compression)
+        self.filename = join(directory, ".".join(parts))
+
+    def _open(self):
+        """Opens the serializer's file, compressing or decompressing it if necessary."""
+        if self.compression:
+            return COMPRESSIONS[self.compression](
+                self.filename, self.filemode[0] + "t")
+        return open(self.filename, self.filemode)
+
+    @instrumented
+    def write_data(self, data, fieldnames=None, batch_size=1000):
         """Writes data to a file.
 
-        :param data: a sequence of dicts.
-        :type data: dict or list
+        Rows are consumed lazily and written in batches, so generators of any
+        length can be serialized in constant memory. When appending to a file
+        which already has content, the header row is not written again. In
+        write mode the file is replaced even if there are no rows, with only a
+        header row if `fieldnames` are given.
+
+        :param data: a dict or an iterable of dicts.
+        :type data: dict, list or iterable
+        :param list fieldnames: Optional column names. Defaults to the keys of
+                the first row.
+        :param int batch_size: the number of rows to write before flushing.
+
+        :returns: the number of rows written.
+        :rtype: int
         """
-        if self.filemode.startswith("r"):
-            raise TypeError("Filemode must allow write operations.")
-        fieldnames = list(
-            data.keys() if isinstance(
-                data, dict) else data[0].keys())
-        with open(self.filename, self.filemode) as f:
+        rows, fieldnames = self._prepare_rows(data, fieldnames)
+        if not fieldnames:
+            if self.filemode.startswith("w"):
+                with self._open():
+                    pass
+            return 0
+        write_header = not (self.filemode.startswith("a") and isfile(
+            self.filename) and getsize(self.filename))
+        count = 0
+        with self._open() as f:
             writer = csv.DictWriter(
                 f, fieldnames=fieldnames, delimiter=self.delimiter)
-            writer.writeheader()
-            writer.writerows(data)
+            if write_header:
+                writer.writeheader()
+            for batch in iter(lambda: list(islice(rows, batch_size)), []):
+                writer.writerows(batch)
+                f.flush()
+                count += len(batch)
+        return count
+
+    def _prepare_rows(self, data, fieldnames):
+        """Checks the filemode and determines fieldnames for rows to be written.
+
+        :returns: an iterator of rows and a list of fieldnames, which is empty
+                if there are no rows to write.
+        :rtype: tuple
+        """
+        if self.filemode.startswith("r"):
+            raise TypeError("Filemode must allow write operations.")
+        rows = iter([data] if isinstance(data, dict) else data)
+        if fieldnames is None:
+            first = next(rows, None)
+            if first is None:
+                return rows, []
+            fieldnames = list(first.keys())
+            rows = chain([first], rows)
+        return rows, list(fieldnames)
 
     def read_data(self):
         """Reads data from file and checks that filemodes are correctly handled."""
+        return list(self.iter_rows())
+
+    @instrumented
+    def iter_rows(self, chunk_size=None, converters=None, memory_map=False):
+        """Lazily reads rows from a file.
 
+        Only the rows currently being processed are held in memory, so
+        arbitrarily large files can be read.
+
+        :param int chunk_size: Optional number of rows to yield at once. If
+                provided, lists of rows are yielded instead of single rows.
+        :param dict converters: Optional mapping of column names to callables
+                which are applied to the values in that column.
+        :param bool memory_map: if True, uncompressed files are memory-mapped
+                rather than read through Python file buffers.
+
+        :yields: rows from the file, or lists of rows if `chunk_size` is set.
+        :yield type: dict or list
+        """
         if not self.filemode.startswith("r"):
             raise TypeError("Read-only filemode required.")
-        with open(self.filename, self.filemode) as f:
-            reader = csv.DictReader(f)
-            return [row for row in reader]
+        if memory_map and not self.compression and getsize(self.filename):
+            with open(self.filename, "rb") as f, mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                lines = (line.decode("utf-8")
+                         for line in iter(mapped.readline, b""))
+                rows = csv.DictReader(lines, delimiter=self.delimiter)
+                yield from self._chunk_rows(rows, chunk_size, converters)
+        else:
+            with self._open() as f:
+                rows = csv.DictReader(f, delimiter=self.delimiter)
+                yield from self._chunk_rows(rows, chunk_size, converters)
+
+    def _chunk_rows(self, rows, chunk_size, converters):
+        """Applies converters to rows and groups them into chunks."""
+        if converters:
+            rows = (self._convert(row, converters) for row in rows)
+        if chunk_size:
+            yield from iter(lambda: list(islice(rows, chunk_size)), [])
+        else:
+            yield from rows
+
+    def _convert(self, row, converters):
+        for column, converter in converters.items():
+            if column in row:
+                row[column] = converter(row[column])
+        return row
 
 
 class CSVSerializer(BaseSerializer):
@@ -61,3 +185,128 @@ class TSVSerializer(BaseSerializer):
 
     delimiter = "\t"
     extension = "tsv"
+
+
+class ParquetSerializer(BaseSerializer):
+    """Writes data to a Parquet file.
+
+    Requires `pyarrow`, which can be installed with the `parquet` extra.
+    """
+
+    extension = "parquet"
+
+    INFERENCE_BATCHES = 3
+    """int: The most batches held in memory while column types are inferred.
+    Columns with no values in them are written as strings."""
+
+    def __init__(self, filename, filemode="w"):
+        if pyarrow is None:
+            raise ImportError(
+                "pyarrow is required to serialize data to Parquet.")
+        if filemode.startswith("a"):
+            raise TypeError("Parquet files cannot be appended to.")
+        super().__init__(filename, filemode)
+        if self.compression:
+            raise ValueError("Parquet files are compressed internally.")
+
+    @instrumented
+    def write_data(self, data, fieldnames=None, batch_size=10000, schema=None):
+        """Writes data to a Parquet file.
+
+        Each batch of rows is written as a row group as it is consumed, so
+        generators of any length can be serialized in constant memory. The file
+        is replaced even if there are no rows. Unless a schema is provided, the
+        type of each column is inferred from its first non-null values. Up to
+        `INFERENCE_BATCHES` batches are held back until every column has a
+        type, after which empty columns are typed as strings, so pass a schema
+        when columns of other types may be empty for many rows. Every batch is
+        cast to the schema safely, so values which do not fit their column's
+        type, such as `2.5` in an integer column, raise an error instead of
+        being truncated.
+
+        :param data: a dict or an iterable of dicts.
+        :type data: dict, list or iterable
+        :param list fieldnames: Optional column names. Defaults to the names in
+                the schema, or the keys of the first row.
+        :param int batch_size: the number of rows in each row group.
+        :param pyarrow.Schema schema: Optional schema of the file.
+
+        :returns: the number of rows written.
+        :rtype: int
+        :raises pyarrow.ArrowInvalid: if a value cannot be safely cast to the
+                type of its column.
+        """
+        if schema is not None and not fieldnames:
+            fieldnames = schema.names
+        rows, fieldnames = self._prepare_rows(data, fieldnames)
+        count = 0
+        writer = None
+        pending = []
+        try:
+            for batch in iter(lambda: list(islice(rows, batch_size)), []):
+                pending.append(pyarrow.Table.from_pydict(
+                    {name: [row.get(name) for row in batch]
+                     for name in fieldnames}))
+                count += len(batch)
+                if not writer:
+                    target = schema or self._infer_schema(
+                        pending, fieldnames,
+                        len(pending) >= self.INFERENCE_BATCHES)
+                    if target is None:
+                        continue
+                    writer = pyarrow.parquet.ParquetWriter(self.filename, target)
+                self._write_tables(writer, pending)
+                pending = []
+            if not writer:
+                writer = pyarrow.parquet.ParquetWriter(
+                    self.filename,
+                    schema or self._infer_schema(pending, fieldnames, True))
+                self._write_tables(writer, pending)
+        finally:
+            if writer:
+                writer.close()
+        return count
+
+    def _infer_schema(self, tables, fieldnames, final=False):
+        """Returns a schema with the first non-null type of each column, or
+        None if a column has no values yet. If `final` is True, columns with
+        no values are typed as strings instead."""
+        fields = []
+        for index, name in enumerate(fieldnames):
+            types = [table.schema.types[index] for table in tables
+                     if table.schema.types[index] != pyarrow.null()]
+            if not types and not final:
+                return None
+            fields.append((name, types[0] if types else pyarrow.string()))
+        return pyarrow.schema(fields)
+
+    def _write_tables(self, writer, tables):
+        for table in tables:
+            writer.write_table(table.cast(writer.schema, safe=True))
+
+    @instrumented
+    def iter_rows(self, chunk_size=None, converters=None, columns=None):
+        """Lazily reads rows from a Parquet file.
+
+        Data is read one record batch at a time, and only the requested columns
+        are read from disk.
+
+        :param int chunk_size: Optional number of rows to yield at once. If
+                provided, lists of rows are yielded instead of single rows.
+        :param dict converters: Optional mapping of column names to callables
+                which are applied to the values in that column.
+        :param list columns: Optional names of the columns to read. Defaults to
+                all columns.
+
+        :yields: rows from the file, or lists of rows if `chunk_size` is set.
+        :yield type: dict or list
+        """
+        if not self.filemode.startswith("r"):
+            raise TypeError("Read-only filemode required.")
+        parquet_file = pyarrow.parquet.ParquetFile(self.filename)
+        rows = (
+            dict(zip(data.keys(), values))
+            for batch in parquet_file.iter_batches(columns=columns)
+            for data in [batch.to_pydict()]
+            for values in zip(*data.values()))
+        yield from self._chunk_rows(rows, chunk_size, converters)
@@ -0,0 +1,163 @@
+"""Trees
+
+Tree walkers traverse the archival object tree of a resource breadth-first
+using the ArchivesSpace tree endpoints (`tree/root` and `tree/waypoint`).
+Each level of the tree is fetched concurrently in batches of waypoints, and the
+next batch is prefetched in the background while the current one is being
+processed. Objects are yielded with context inherited from their ancestors, so
+that consumers do not need to fetch ancestors themselves.
+
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from asnake.jsonmodel import wrap_json_object
+
+from .fetchers import Fetcher, stream_map
+
+TreeItem = namedtuple("TreeItem", ["record", "depth", "context"])
+"""namedtuple: An archival object in a tree.
+
+`context` is a dict containing:
+
+- `ancestors`: URIs of the object's ancestors, nearest first.
+- `dates`: the object's dates, or those of its closest ancestor with dates.
+- `restricted`: True if the object or any ancestor has restrictions applied.
+- `container_refs`: top container refs of the object's instances, or those of
+  its closest ancestor with instances.
+"""
+
+
+EMPTY_CONTEXT = {"ancestors": [], "dates": [], "restricted": False,
+                 "container_refs": []}
+"""dict: The context of a record without ancestors."""
+
+
+def inherit_context(parent_context, data, parent_uri=None):
+    """Builds the context of a record from its own data and its parent's context.
+
+    :param dict parent_context: the context of the record's parent.
+    :param dict data: the record's JSON.
+    :param str parent_uri: Optional URI of the record's parent.
+
+    :rtype: dict
+    """
+    container_refs = [
+        instance["sub_container"]["top_container"]["ref"]
+        for instance in data.get("instances", []) if "sub_container" in instance]
+    return {
+        "ancestors": ([parent_uri] if parent_uri else []) + parent_context["ancestors"],
+        "dates": data.get("dates") or parent_context["dates"],
+        "restricted": bool(
+            data.get("restrictions_apply") or data.get("restrictions")
+            or parent_context["restricted"]),
+        "container_refs": container_refs or parent_context["container_refs"],
+    }
+
+
+class TreeWalker:
+    """Walks the archival object tree of a resource breadth-first."""
+
+    def __init__(self, client=None, fetcher=None, batch_size=10):
+        """Sets initial attributes for the walker.
+
+        :param ASnakeClient client: Optional client used to make requests.
+                Defaults to the client of the fetcher.
+        :param Fetcher fetcher: Optional fetcher used to make concurrent
+                requests. Defaults to a new Fetcher for the client.
+        :param int batch_size: the number of waypoints, each of up to 200
+                children, whose records are fetched together. At most two
+                batches are held in memory at once, however wide a level is.
+        """
+        self.fetcher = fetcher or Fetcher(client)
+        self.client = client or self.fetcher.client
+        self.batch_size = batch_size
+
+    def walk(self, resource):
+        """Yields every archival object in a resource, one level at a time.
+
+        :param resource: an ArchivesSpace resource, or its URI.
+        :type resource: JSONModelObject or str
+
+        :yields: archival objects with their depth and inherited context.
+        :yield type: TreeItem
+        """
+        resource_uri = resource if isinstance(resource, str) else resource.uri
+        resource_data = self.fetcher.get(resource_uri)
+        root = self.fetcher.get("{}/tree/root".format(resource_uri))
+        precomputed = {
+            (None, int(offset)): children for offset, children in
+            root.get("precomputed_waypoints", {}).get("", {}).items()}
+        batches = self._iter_batches(resource_uri, [(
+            None, root["waypoints"],
+            inherit_context(EMPTY_CONTEXT, resource_data))], precomputed)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            batch = executor.submit(next, batches, None)
+            while True:
+                items = batch.result()
+                if items is None:
+                    break
+                batch = executor.submit(next, batches, None)
+                yield from items
+
+    def _iter_batches(self, resource_uri, parents, precomputed):
+        """Fetches the tree level by level, a batch of waypoints at a time.
+
+        Only the parents for the next level are kept between batches.
+
+        :yields: TreeItems for the children in each batch of waypoints.
+        :yield type: list
+        """
+        depth = 1
+        while parents:
+            requests = ((parent_uri, offset, context)
+                        for parent_uri, waypoints, context in parents
+                        for offset in range(waypoints))
+            next_parents = []
+            for batch in iter(
+                    lambda: list(islice(requests, self.batch_size)), []):
+                items, children = self._load_batch(
+                    resource_uri, batch, depth, precomputed)
+                next_parents.extend(children)
+                yield items
+            parents = next_parents
+            depth += 1
+
+    def _load_batch(self, resource_uri, requests, depth, precomputed):
+        """Fetches the children listed in a batch of waypoints.
+
+        :returns: TreeItems for the children, and the children which have
+                children of their own, as parents for the next level.
+        :rtype: tuple
+        """
+        def children(request):
+            parent_uri, offset, _ = request
+            if (parent_uri, offset) in precomputed:
+                return precomputed[(parent_uri, offset)]
+            return self._waypoint(resource_uri, parent_uri, offset)
+
+        summaries = []
+        for (parent_uri, _, context), waypoint in zip(requests, stream_map(
+                children, requests, self.fetcher.max_workers)):
+            summaries.extend((child, parent_uri, context) for child in waypoint)
+        records = stream_map(
+            self.fetcher.get, [child["uri"] for child, _, _ in summaries],
+            self.fetcher.max_workers)
+        items = []
+        next_parents = []
+        for (child, parent_uri, parent_context), data in zip(summaries, records):
+            context = inherit_context(
+                parent_context, data, parent_uri or resource_uri)
+            items.append(TreeItem(
+                wrap_json_object(data, self.client), depth, context))
+            if child.get("child_count"):
+                next_parents.append((child["uri"], child["waypoints"], context))
+        return items, next_parents
+
+    def _waypoint(self, resource_uri, parent_uri, offset):
+        params = {"offset": offset}
+        if parent_uri:
+            params["parent_node"] = parent_uri
+        return self.fetcher.get(
+            "{}/tree/waypoint".format(resource_uri), params=params)
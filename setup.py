@@ -15,6 +15,8 @@ setup(name='rac-aspace',
       packages=find_packages(),
       install_requires=["ArchivesSnake>=0.8.1",
                         "rapidfuzz>=0.7.3"],
+      extras_require={"parquet": ["pyarrow>=0.17.0"],
+                      "zstd": ["zstandard>=0.15.0"]},
       tests_require=["pytest",
                      "pre-commit>=1.18.3",
                      "sphinx>=1.8.5",
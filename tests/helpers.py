@@ -0,0 +1,118 @@
+"""
+Shared helpers for unit tests
+"""
+import time
+from collections import Counter
+from copy import deepcopy
+from threading import Lock
+from unittest.mock import Mock
+
+from requests import Session
+
+
+def archival_object(uri, **fields):
+    """Returns the JSON of a minimal archival object."""
+    return dict({"jsonmodel_type": "archival_object", "uri": uri}, **fields)
+
+
+class MockClient:
+    """A configurable stand-in for an ArchivesSnake client.
+
+    Records are served from memory and every request is stored in `requests`
+    as a tuple of method, URI and params. Posts update `records`, rejecting
+    stale lock_versions, and deletes remove records.
+    """
+
+    config = {"baseurl": "http://localhost:8089"}
+
+    def __init__(self, records=None, default=None, pages=None, routes=None,
+                 failures=0, status_code=503, delays=None, conflicts=0,
+                 failing=()):
+        """Sets the data served by the client.
+
+        :param dict records: JSON responses keyed by URI. Requests for other
+                URIs receive a 404 response unless `default` is set.
+        :param callable default: Optional function which receives a URI which
+                is not in `records` and returns its JSON.
+        :param dict pages: records served by `get_paged`, keyed by URI.
+        :param dict routes: functions which receive the params of a request
+                and return its JSON, keyed by URI.
+        :param int failures: the number of requests for each URI which fail
+                before it is served.
+        :param int status_code: the status code of failed requests.
+        :param dict delays: seconds to wait before responding, keyed by URI.
+        :param int conflicts: the number of posts to reject as conflicts.
+        :param failing: URIs for which posts raise a ConnectionError.
+        """
+        self.records = records if records is not None else {}
+        self.default = default
+        self.pages = pages or {}
+        self.routes = routes or {}
+        self.failures = failures
+        self.status_code = status_code
+        self.delays = delays or {}
+        self.conflicts = conflicts
+        self.failing = failing
+        self.requests = []
+        self.session = Session()
+        self.lock = Lock()
+        self._attempts = Counter()
+
+    def requested(self, method="GET"):
+        """Returns the URIs requested with a method, in order."""
+        return [uri for m, uri, _ in self.requests if m == method]
+
+    def get(self, uri, **kwargs):
+        params = kwargs.get("params", {})
+        if params is None:
+            raise TypeError("ArchivesSnake clients require params to be a dict.")
+        with self.lock:
+            self.requests.append(("GET", uri, kwargs.get("params")))
+            self._attempts[uri] += 1
+            attempts = self._attempts[uri]
+        time.sleep(self.delays.get(uri, 0))
+        if attempts <= self.failures:
+            return Mock(status_code=self.status_code)
+        if uri in self.routes:
+            return self._response(200, self.routes[uri](params))
+        if uri in self.records:
+            return self._response(200, deepcopy(self.records[uri]))
+        if self.default:
+            return self._response(200, self.default(uri))
+        return self._response(404, {"error": "Record not found"})
+
+    def get_paged(self, uri, **kwargs):
+        with self.lock:
+            self.requests.append(("GET", uri, kwargs.get("params")))
+        yield from deepcopy(self.pages.get(uri, []))
+
+    def post(self, uri, json=None, **kwargs):
+        with self.lock:
+            self.requests.append(("POST", uri, kwargs.get("params")))
+            if uri in self.failing:
+                raise ConnectionError("Connection refused")
+            if uri not in self.records:
+                json["uri"] = "{}/{}".format(uri, len(self.records) + 1)
+                json["lock_version"] = 0
+                self.records[json["uri"]] = json
+                return self._response(
+                    200, {"status": "Created", "uri": json["uri"]})
+            current = self.records[uri]
+            if self.conflicts or json.get("lock_version") != current.get("lock_version"):
+                self.conflicts = max(self.conflicts - 1, 0)
+                current["lock_version"] = current.get("lock_version", 0) + 1
+                return self._response(
+                    409, {"error": {"lock_version": ["stale"]}})
+            json["lock_version"] = json.get("lock_version", 0) + 1
+            self.records[uri] = json
+            return self._response(200, {"status": "Updated", "uri": uri})
+
+    def delete(self, uri, **kwargs):
+        with self.lock:
+            self.requests.append(("DELETE", uri, kwargs.get("params")))
+            if self.records.pop(uri, None) is None:
+                return self._response(404, {"error": "Record not found"})
+        return self._response(200, {"status": "Deleted", "uri": uri})
+
+    def _response(self, status_code, data):
+        return Mock(status_code=status_code, json=lambda: data)
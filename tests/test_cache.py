@@ -0,0 +1,134 @@
+"""
+Unit tests for the record cache
+"""
+import time
+import unittest
+from os import remove
+from os.path import isfile
+
+from asnake.jsonmodel import wrap_json_object
+from rac_aspace import cache, data_helpers
+
+from .helpers import MockClient, archival_object
+
+
+def cached_object(uri):
+    return archival_object(
+        uri, lock_version=0, system_mtime="2020-03-19T13:07:13Z",
+        extents=[{"number": uri[-1]}] if uri.endswith("1") else [],
+        ancestors=[{"ref": "/repositories/2/archival_objects/1"}])
+
+
+class TestCache(unittest.TestCase):
+    """Tests the SQLite record cache."""
+
+    def setUp(self):
+        self.uri = "/repositories/2/archival_objects/1"
+        self.data = {"uri": self.uri, "lock_version": 2,
+                     "system_mtime": "2020-03-19T13:07:13Z"}
+
+    def test_record_cache(self):
+        """Checks storage, persistence and expiry of cached records."""
+        path = "cache.sqlite"
+        record_cache = cache.RecordCache(path)
+        record_cache.set(self.uri.lstrip("/"), self.data)
+        self.assertEqual(record_cache.get(self.uri), self.data)
+        self.assertIsNone(cache.RecordCache(path).get(self.uri))
+        record_cache.flush()
+        self.assertEqual(cache.RecordCache(path).get(self.uri), self.data)
+        record_cache.ttl = -1
+        self.assertIsNone(record_cache.get(self.uri))
+        self.assertEqual(record_cache.get(self.uri, allow_stale=True), self.data)
+        self.assertEqual(record_cache.stale_uris(), [self.uri])
+        record_cache.evict()
+        self.assertEqual(record_cache.stale_uris(), [self.uri])
+        record_cache.max_entries = 0
+        record_cache.evict()
+        self.assertEqual(len(record_cache), 0)
+        remove(path)
+
+    def test_batched_writes(self):
+        """Checks that new entries are written in batches and readable before."""
+        path = "cache.sqlite"
+        record_cache = cache.RecordCache(path, batch_size=3)
+        for i in range(2):
+            record_cache.set("/subjects/{}".format(i), {"uri": "/subjects/{}".format(i)})
+        self.assertEqual(len(cache.RecordCache(path)), 0)
+        self.assertIn("/subjects/1", record_cache)
+        self.assertEqual(len(cache.RecordCache(path)), 2)
+        record_cache.set("/subjects/3", {})
+        record_cache.delete("/subjects/3")
+        record_cache.flush()
+        self.assertNotIn("/subjects/3", cache.RecordCache(path))
+
+    def test_access_times(self):
+        """Checks that access times are written in batches."""
+        record_cache = cache.RecordCache(batch_size=2)
+        record_cache.set(self.uri, self.data)
+        record_cache.flush()
+        accessed = "SELECT accessed FROM records"
+        written = record_cache._connection.execute(accessed).fetchone()[0]
+        time.sleep(0.001)
+        record_cache.get(self.uri)
+        self.assertEqual(
+            record_cache._connection.execute(accessed).fetchone()[0], written)
+        record_cache.get(self.uri)
+        self.assertGreater(
+            record_cache._connection.execute(accessed).fetchone()[0], written)
+
+    def test_size_eviction(self):
+        """Checks that least recently used entries are evicted."""
+        record_cache = cache.RecordCache(max_entries=3)
+        for i in range(3):
+            record_cache.set("/subjects/{}".format(i), {})
+            time.sleep(0.001)
+        record_cache.get("/subjects/0")
+        record_cache.set("/subjects/3", {})
+        self.assertEqual(len(record_cache), 3)
+        self.assertNotIn("/subjects/1", record_cache)
+        self.assertIn("/subjects/0", record_cache)
+
+    def test_revalidate(self):
+        """Checks that unmodified entries are refreshed and modified ones dropped."""
+        record_cache = cache.RecordCache(ttl=-1)
+        record_cache.set(self.uri, self.data)
+        record_cache.set("/repositories/2/archival_objects/2",
+                         dict(self.data, uri="/repositories/2/archival_objects/2"))
+        client = MockClient(pages={"/repositories/2/search": [
+            {"uri": self.uri, "system_mtime": "2020-03-19T13:07:13Z"},
+            {"uri": "/repositories/2/archival_objects/2",
+             "system_mtime": "2021-01-01T00:00:00Z"}]})
+        self.assertEqual(
+            record_cache.revalidate_from_search(client, "/repositories/2"), 1)
+        self.assertIn("fields", client.requests[0][2])
+        record_cache.ttl = 60
+        self.assertEqual(record_cache.get(self.uri), self.data)
+        self.assertIsNone(record_cache.get(
+            "/repositories/2/archival_objects/2", allow_stale=True))
+
+    def test_caching_client(self):
+        """Checks that data helpers read records through the cache."""
+        client = MockClient(default=cached_object)
+        caching_client = cache.CachingClient(client)
+        for i in range(2, 5):
+            archival_object = wrap_json_object(
+                {"ref": "/repositories/2/archival_objects/{}".format(i)},
+                client=caching_client)
+            value = data_helpers.closest_value(archival_object, "extents")
+            self.assertEqual(value, [{"number": "1"}])
+        self.assertEqual(client.requested().count(self.uri), 1)
+        caching_client.post(self.uri, json={})
+        self.assertNotIn(self.uri, caching_client.cache)
+        caching_client.get("/repositories/2/archival_objects",
+                           params={"all_ids": True})
+        self.assertNotIn("/repositories/2/archival_objects", caching_client.cache)
+        self.assertEqual(caching_client.config, client.config)
+
+    def tearDown(self):
+        for filename in ["cache.sqlite", "cache.sqlite-wal", "cache.sqlite-shm"]:
+            if isfile(filename):
+                remove(filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,12 +4,15 @@ Unit tests for Data Helpers
 import json
 import os
 import unittest
+from datetime import datetime
 
 import vcr
 from asnake.aspace import ASpace
 from asnake.jsonmodel import JSONModelObject, wrap_json_object
 from rac_aspace import data_helpers
 
+from .helpers import MockClient
+
 rac_vcr = vcr.VCR(
     serializer="json",
     cassette_library_dir=os.path.join("fixtures", "cassettes"),
@@ -55,6 +58,26 @@ class TestDataHelpers(unittest.TestCase):
                 set(result), set(expected),
                 "{} returned {}, expecting {}".format(fixture, result, expected))
 
+    def test_iter_note_text(self):
+        """Checks that note text is extracted from all notes in one pass."""
+        fixtures = ["note_bibliography.json", "note_index.json",
+                    "note_multi.json", "note_multi_chronology.json",
+                    "note_multi_defined.json", "note_multi_ordered.json",
+                    "note_single.json"]
+        notes = [self.load_fixture(f) for f in fixtures]
+        pairs = list(data_helpers.iter_note_text({"notes": notes}))
+        self.assertEqual(
+            [text for _, text in pairs],
+            [text for note in notes for text in data_helpers.get_note_text(note)])
+        self.assertEqual(
+            [note_type for note_type, _ in pairs][:3],
+            [notes[0].get("type", "note_bibliography")] * 3)
+        note = {"jsonmodel_type": "note_singlepart", "type": "abstract",
+                "content": ["<p>Some <i>text</i></p>"]}
+        self.assertEqual(
+            list(data_helpers.iter_note_text({"notes": [note]}, strip_html=True)),
+            [("abstract", "Some text")])
+
     def test_text_in_note(self):
         """Checks whether the query string and note content are close to a match."""
         for fixture, query_string, outcome in [
@@ -67,6 +90,29 @@ class TestDataHelpers(unittest.TestCase):
             result = data_helpers.text_in_note(note, query_string)
             self.assertEqual(result, outcome)
 
+    def test_note_index(self):
+        """Checks that bulk note searches agree with text_in_note."""
+        notes = [self.load_fixture(f) for f in [
+            "note_single.json", "note_multi.json", "note_bibliography.json"]]
+        objects = [{"uri": "/repositories/2/archival_objects/{}".format(i),
+                    "notes": [note]} for i, note in enumerate(notes)]
+        queries = ["Go Mets!", "materials are restricted", "Boo Yankees"]
+        index = data_helpers.NoteIndex(objects)
+        self.assertEqual(len(index), 3)
+        results = index.search_many(queries)
+        for query in queries:
+            expected = set(obj["uri"] for obj, note in zip(objects, notes)
+                           if data_helpers.text_in_note(note, query))
+            self.assertEqual(results[query], expected)
+        self.assertEqual(index.search("MATERIALS ARE RESTRICTED"),
+                         {"/repositories/2/archival_objects/1"})
+
+        index = data_helpers.NoteIndex(note_types=["accessrestrict"])
+        index.add(self.load_fixture("archival_object.json"), key="restricted")
+        self.assertEqual(index.search("materials are restricted"), {"restricted"})
+        self.assertEqual(index.search("Go Mets!"), set())
+        self.assertEqual(data_helpers.NoteIndex().search("Go Mets!"), set())
+
     def test_object_locations(self):
         """Checks whether the function returns a list of JSONModelObjects."""
         with rac_vcr.use_cassette("test_get_locations.json"):
@@ -79,6 +125,40 @@ class TestDataHelpers(unittest.TestCase):
             for obj in locations:
                 self.assertIsInstance(obj, JSONModelObject)
 
+    def test_object_locations_batch(self):
+        """Checks that shared top containers are fetched once, in bulk."""
+        def archival_object(number, container_ids):
+            return {
+                "jsonmodel_type": "archival_object",
+                "uri": "/repositories/2/archival_objects/{}".format(number),
+                "instances": [
+                    {"jsonmodel_type": "instance", "sub_container": {
+                        "jsonmodel_type": "sub_container",
+                        "top_container": {
+                            "ref": "/repositories/2/top_containers/{}".format(i)}}}
+                    for i in container_ids]}
+
+        def top_container(number):
+            return {"jsonmodel_type": "top_container",
+                    "uri": "/repositories/2/top_containers/{}".format(number),
+                    "container_locations": [
+                        {"jsonmodel_type": "container_location",
+                         "ref": "/locations/{}".format(number)}]}
+
+        client = MockClient({"/repositories/2/top_containers": [
+            top_container(1), top_container(2)]})
+        archival_objects = [
+            wrap_json_object(archival_object(n, ids), client=client)
+            for n, ids in [(1, [1]), (2, [1, 2]), (3, [])]]
+        locations = data_helpers.object_locations_batch(archival_objects)
+        self.assertEqual(client.requests, [
+            ("GET", "/repositories/2/top_containers", {"id_set": [1, 2]})])
+        self.assertEqual(
+            {uri: [loc.ref for loc in locs] for uri, locs in locations.items()},
+            {"/repositories/2/archival_objects/1": ["/locations/1"],
+             "/repositories/2/archival_objects/2": ["/locations/1", "/locations/2"],
+             "/repositories/2/archival_objects/3": []})
+
     def test_format_resource_id(self):
         """Checks whether the function returns a concatenated string as expected."""
         for fixture, formatted, separator in [
@@ -100,6 +180,52 @@ class TestDataHelpers(unittest.TestCase):
             value = data_helpers.closest_value(archival_object, "extents")
             self.assertTrue(len(value) > 0)
 
+    def test_closest_value_resolver(self):
+        """Checks that ancestors are fetched once and then served from cache."""
+        with rac_vcr.use_cassette("test_closest_value.json"):
+            repository = ASpace(
+                baseurl="http://localhost:8089").repositories(2)
+            archival_object = repository.archival_objects(7)
+            resolver = data_helpers.ClosestValueResolver(maxsize=10)
+            first = resolver.resolve(archival_object, "extents")
+            second = resolver.resolve(archival_object, "extents")
+            self.assertTrue(len(first) > 0)
+            self.assertEqual(
+                [e.json() for e in first], [e.json() for e in second])
+            info = resolver.cache_info()
+            self.assertEqual((info.hits, info.misses), (1, 1))
+            self.assertEqual(info.currsize, 1)
+
+    def test_resolve_tree(self):
+        """Checks that values are inherited top-down across a resource tree."""
+        resource_uri = "/repositories/2/resources/1"
+        series_uri = "/repositories/2/archival_objects/1"
+        file_uri = "/repositories/2/archival_objects/2"
+        client = MockClient({
+            resource_uri + "/tree": {
+                "node_type": "resource", "record_uri": resource_uri,
+                "children": [{
+                    "node_type": "archival_object", "record_uri": series_uri,
+                    "has_children": True,
+                    "children": [{
+                        "node_type": "archival_object", "record_uri": file_uri,
+                        "has_children": False, "children": []}]}]},
+            series_uri: {"jsonmodel_type": "archival_object",
+                         "uri": series_uri, "extents": [{"number": "1"}]},
+            file_uri: {"jsonmodel_type": "archival_object",
+                       "uri": file_uri, "extents": []},
+        })
+        resource = wrap_json_object(
+            {"jsonmodel_type": "resource", "uri": resource_uri, "extents": []},
+            client=client)
+        resolver = data_helpers.ClosestValueResolver(maxsize=2)
+        results = [(r.uri, v) for r, v in resolver.resolve_tree(
+            resource, "extents")]
+        self.assertEqual(results, [(series_uri, [{"number": "1"}]),
+                                   (file_uri, [{"number": "1"}])])
+        self.assertEqual(client.requested().count(series_uri), 1)
+        self.assertEqual(resolver.cache_info().currsize, 2)
+
     def test_get_orphans(self):
         with rac_vcr.use_cassette("test_get_orphans.json"):
             repository = ASpace(
@@ -162,6 +288,50 @@ class TestDataHelpers(unittest.TestCase):
                 archival_object, query_string, restriction_acts)
             self.assertEqual(result, outcome)
 
+    def test_restriction_evaluator(self):
+        """Checks that bulk evaluation agrees with is_restricted and reports reasons."""
+        objects = [self.load_fixture(f) for f in [
+            "archival_object.json", "archival_object_2.json",
+            "archival_object_3.json"]]
+        for i, obj in enumerate(objects):
+            obj["uri"] = "/repositories/2/archival_objects/{}".format(i)
+        for query_string, restriction_acts in [
+                ("materials are restricted", ["disallow", "conditional"]),
+                ("materials are restricted", ["allow"]),
+                ("test", ["allow"])]:
+            evaluator = data_helpers.RestrictionEvaluator(
+                [query_string], restriction_acts, batch_size=2)
+            results = list(evaluator.evaluate(iter(objects)))
+            self.assertEqual([r.key for r in results],
+                             [obj["uri"] for obj in objects])
+            self.assertEqual(
+                [r.restricted for r in results],
+                [data_helpers.is_restricted(obj, query_string, restriction_acts)
+                 for obj in objects])
+
+        statement = self.load_fixture("rights_statement_restricted.json")
+        obj = {"uri": "/repositories/2/archival_objects/9", "notes": [],
+               "rights_statements": [statement]}
+        evaluator = data_helpers.RestrictionEvaluator(
+            ["test"], ["disallow", "conditional"])
+        result = next(evaluator.evaluate([obj]))
+        self.assertEqual(result.reason, "rights_statement:disallow")
+        evaluator = data_helpers.RestrictionEvaluator(
+            ["test"], ["disallow", "conditional"], as_of=datetime(2300, 1, 1))
+        self.assertFalse(next(evaluator.evaluate([obj])).restricted)
+        result = next(data_helpers.RestrictionEvaluator(
+            ["materials are restricted"], []).evaluate([objects[0]]))
+        self.assertEqual(result.reason, "note:materials are restricted")
+
+    def test_indicates_restriction_no_end_date(self):
+        """Checks that rights statements without end dates do not expire."""
+        statement = self.load_fixture("rights_statement_restricted.json")
+        del statement["end_date"]
+        for act in statement["acts"]:
+            act.pop("end_date", None)
+        self.assertTrue(data_helpers.indicates_restriction(
+            statement, ["disallow"]))
+
     def test_strip_html_tags(self):
         """Ensures HTML tags are correctly removed from strings."""
         input = "<h1>Title</h1><p>This is <i>some</i> text! It is wrapped in a variety of html tags, which should <strong>all</strong> be stripped &amp; not returned.</p>"
@@ -195,6 +365,33 @@ class TestDataHelpers(unittest.TestCase):
                     "was not found in this object", str(
                         excpt.exception))
 
+    def test_compile_format(self):
+        """Test that compiled format strings resolve nested fields once."""
+        location = self.obj_from_fixture("date_expression.json")
+        formatter = data_helpers.compile_format(
+            "{begin:>6}|{end!r}|{{literal}}")
+        self.assertEqual(formatter(location), "  1905|'1980'|{literal}")
+        self.assertIs(
+            data_helpers.compile_format("{begin:>6}|{end!r}|{{literal}}"),
+            formatter)
+
+        calls = []
+
+        class Building:
+            def __getattr__(self, key):
+                calls.append(key)
+                return {"floor": "2", "room": "201"}
+
+        formatter = data_helpers.compile_format(
+            "{building.floor}, room {building.room}")
+        labels = list(map(formatter, [Building(), Building()]))
+        self.assertEqual(labels, ["2, room 201", "2, room 201"])
+        self.assertEqual(calls, ["building", "building"])
+        with self.assertRaises(KeyError):
+            formatter({"building": {"floor": "2"}})
+        with self.assertRaises(Exception):
+            data_helpers.compile_format("")
+
 
 if __name__ == "__main__":
     unittest.main()
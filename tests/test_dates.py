@@ -0,0 +1,98 @@
+"""
+Unit tests for date normalization
+"""
+import json
+import os
+import unittest
+from datetime import date
+
+from asnake.jsonmodel import wrap_json_object
+from rac_aspace import dates
+from rac_aspace.dates import DateRange
+
+from .helpers import MockClient
+
+
+def ordinal(*args):
+    return date(*args).toordinal()
+
+
+class TestDates(unittest.TestCase):
+    """Tests normalizing dates into ranges of ordinals."""
+
+    def load_fixture(self, filename):
+        with open(os.path.join("fixtures", filename)) as json_file:
+            return json.load(json_file)
+
+    def test_to_ordinal(self):
+        """Checks that incomplete dates are expanded to their first or last day."""
+        for value, end, expected in [
+                ("1905", False, ordinal(1905, 1, 1)),
+                ("1905", True, ordinal(1905, 12, 31)),
+                ("1904-02", True, ordinal(1904, 2, 29)),
+                ("1905-03-12", True, ordinal(1905, 3, 12)),
+                ("1905-02-30", False, ordinal(1905, 2, 28)),
+                ("1905-13", False, None),
+                ("undated", False, None),
+                (None, False, None)]:
+            self.assertEqual(dates.to_ordinal(value, end), expected, value)
+
+    def test_normalize_date(self):
+        """Checks that date fixtures are normalized."""
+        full_range = DateRange(ordinal(1905, 1, 1), ordinal(1980, 12, 31))
+        for fixture, expected in [
+                ("date_expression.json", full_range),
+                ("date_no_expression.json", full_range),
+                ("date_no_expression_no_end.json",
+                 DateRange(ordinal(1905, 1, 1), ordinal(1905, 12, 31)))]:
+            self.assertEqual(
+                dates.normalize_date(self.load_fixture(fixture)), expected)
+        self.assertEqual(
+            dates.normalize_date({"expression": "circa 1920s-1935"}),
+            DateRange(ordinal(1920, 1, 1), ordinal(1935, 12, 31)))
+        self.assertEqual(
+            dates.normalize_date({"expression": "1950, 1910 and 1930"}),
+            DateRange(ordinal(1910, 1, 1), ordinal(1950, 12, 31)))
+        self.assertIsNone(dates.normalize_date({"expression": "undated"}))
+
+    def test_overlapping(self):
+        """Checks that records are filtered by overlapping ranges."""
+        records = [{"uri": str(begin), "dates": [{"begin": str(begin)}]}
+                   for begin in range(1900, 2000, 10)]
+        records.append({"uri": "undated", "dates": [{"expression": "undated"}]})
+        self.assertEqual(
+            [r["uri"] for r in dates.overlapping(records, "1925", "1950-06")],
+            ["1930", "1940", "1950"])
+        self.assertEqual(
+            [r["uri"] for r in dates.overlapping(
+                records, date(1910, 12, 31), ordinal(1920, 1, 1))],
+            ["1910", "1920"])
+
+    def test_object_spans(self):
+        """Checks that spans include ancestors, which are fetched once."""
+        resource = {"jsonmodel_type": "resource", "uri": "/repositories/2/resources/1",
+                    "dates": [{"begin": "1900", "end": "1950"}]}
+        series = {"jsonmodel_type": "archival_object",
+                  "uri": "/repositories/2/archival_objects/1", "dates": [],
+                  "ancestors": [{"ref": resource["uri"]}]}
+        files = [{"jsonmodel_type": "archival_object",
+                  "uri": "/repositories/2/archival_objects/{}".format(i),
+                  "dates": [{"begin": "1960-05-01"}],
+                  "ancestors": [{"ref": series["uri"]}, {"ref": resource["uri"]}]}
+                 for i in range(2, 5)]
+        client = MockClient({r["uri"]: r for r in [resource, series] + files})
+        spans = dict(dates.object_spans(
+            [wrap_json_object(r, client) for r in [series] + files]))
+        self.assertEqual(spans[series["uri"]],
+                         DateRange(ordinal(1900, 1, 1), ordinal(1950, 12, 31)))
+        self.assertEqual(spans[files[0]["uri"]],
+                         DateRange(ordinal(1900, 1, 1), ordinal(1960, 5, 1)))
+        self.assertEqual(client.requested(), [resource["uri"]])
+        self.assertEqual(
+            dates.span([resource] + files),
+            DateRange(ordinal(1900, 1, 1), ordinal(1960, 5, 1)))
+        self.assertIsNone(dates.span([series]))
+
+
+if __name__ == '__main__':
+    unittest.main()
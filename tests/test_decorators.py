@@ -0,0 +1,47 @@
+"""
+Unit tests for Decorators
+"""
+import os
+import subprocess
+import sys
+import unittest
+from unittest.mock import patch
+
+from rac_aspace import decorators
+
+
+class TestDecorators(unittest.TestCase):
+    """Tests the check_type decorator."""
+
+    def test_check_type(self):
+        """Checks that arguments are validated by default."""
+        def first(arg):
+            return arg
+        checked = decorators.check_type(dict)(first)
+        self.assertIsNot(checked, first)
+        self.assertEqual(checked({}), {})
+        with self.assertRaises(TypeError):
+            checked([])
+
+    def test_skip_type_checks(self):
+        """Checks that functions are returned undecorated when checks are disabled."""
+        def first(arg):
+            return arg
+        with patch.object(decorators, "TYPE_CHECKS", False):
+            unchecked = decorators.check_type(dict)(first)
+        self.assertIs(unchecked, first)
+        self.assertEqual(unchecked([]), [])
+
+    def test_environment_variable(self):
+        """Checks that the environment variable disables checks at import time."""
+        env = dict(os.environ, RAC_ASPACE_SKIP_TYPE_CHECKS="true")
+        output = subprocess.check_output([
+            sys.executable, "-c",
+            "from rac_aspace import data_helpers; "
+            "print(hasattr(data_helpers.get_note_text, '__wrapped__'))"],
+            env=env)
+        self.assertEqual(output.strip(), b"False")
+
+
+if __name__ == '__main__':
+    unittest.main()
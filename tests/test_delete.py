@@ -3,11 +3,108 @@ Unit tests for delete operations in ArchivesSpace
 """
 import unittest
 
+from rac_aspace import deleters
+from rac_aspace.deleters import FieldDeletion
+
+from .helpers import MockClient
+
 
 class TestDataDeleters(unittest.TestCase):
+    """Tests bulk deletes of records and field values."""
+
+    def setUp(self):
+        self.resource = "/repositories/2/resources/1"
+        self.series = "/repositories/2/archival_objects/1"
+        self.file = "/repositories/2/archival_objects/2"
+        self.subject = "/subjects/1"
+        self.records = {
+            self.resource: {"uri": self.resource, "lock_version": 0},
+            self.series: {"uri": self.series, "lock_version": 0,
+                          "ancestors": [{"ref": self.resource}]},
+            self.file: {"uri": self.file, "lock_version": 0,
+                        "ancestors": [{"ref": self.series}, {"ref": self.resource}]},
+            self.subject: {"uri": self.subject, "lock_version": 0},
+            "/repositories/2/archival_objects/3": {
+                "uri": "/repositories/2/archival_objects/3", "lock_version": 0,
+                "subjects": [{"ref": "/subjects/1"}, {"ref": "/subjects/2"}],
+                "extents": [{"number": "1"}], "title": "Title"},
+        }
+
+    def test_remove_field_values(self):
+        """Checks that whole fields, values and references are removed."""
+        data = {"subjects": [{"ref": "/subjects/1"}, {"ref": "/subjects/2"}],
+                "tags": ["a", "b"], "title": "Title"}
+        deleters.remove_field_values(data, [
+            FieldDeletion("", "subjects", "/subjects/1"),
+            FieldDeletion("", "tags", "b"),
+            FieldDeletion("", "title")])
+        self.assertEqual(data, {"subjects": [{"ref": "/subjects/2"}],
+                                "tags": ["a"]})
+
+        data = {"level": "file", "title": "Old",
+                "parent": {"ref": "/repositories/2/archival_objects/1"}}
+        deleters.remove_field_values(data, [
+            FieldDeletion("", "level", "file"),
+            FieldDeletion("", "title", "New"),
+            FieldDeletion("", "parent", "/repositories/2/archival_objects/1"),
+            FieldDeletion("", "tags", "a")])
+        self.assertEqual(data, {"title": "Old"})
+
+    def test_dependency_levels(self):
+        """Checks that children are deleted before their parents."""
+        deleter = deleters.BulkDeleter(MockClient(self.records))
+        levels = deleter.dependency_levels(
+            [self.subject, self.resource, self.series, self.file, "/repositories/2"])
+        self.assertEqual(levels, [[self.file], [self.series], [self.resource],
+                                  [self.subject], ["/repositories/2"]])
+
+        classification = "/repositories/2/classifications/1"
+        term = "/repositories/2/classification_terms/{}".format
+        component = "/repositories/2/digital_object_components/{}".format
+        records = {
+            classification: {"uri": classification},
+            term(1): {"uri": term(1), "classification": {"ref": classification}},
+            term(2): {"uri": term(2), "parent": {"ref": term(1)}},
+            component(1): {"uri": component(1)},
+            component(2): {"uri": component(2), "parent": {"ref": component(1)}},
+        }
+        levels = deleters.BulkDeleter(MockClient(records)).dependency_levels(
+            [classification, term(1), component(1), term(2), component(2)])
+        self.assertEqual(levels, [[component(2)], [component(1)], [term(2)],
+                                  [term(1)], [classification]])
+
+    def test_delete(self):
+        """Checks that field deletions are grouped and records deleted in order."""
+        uri = "/repositories/2/archival_objects/3"
+        client = MockClient(self.records)
+        deleter = deleters.BulkDeleter(client)
+        results = list(deleter.delete([
+            self.series, FieldDeletion(uri, "subjects", "/subjects/1"),
+            self.file, FieldDeletion(uri, "extents"),
+            FieldDeletion(self.file, "title")]))
+        self.assertTrue(all(r.deleted for r in results))
+        self.assertEqual([r.uri for r in results], [uri, self.file, self.series])
+        self.assertEqual(client.requested().count(uri), 1)
+        self.assertEqual(client.requested("POST").count(uri), 1)
+        self.assertNotIn(self.file, client.requested("POST"))
+        self.assertEqual(client.records[uri]["subjects"], [{"ref": "/subjects/2"}])
+        self.assertNotIn("extents", client.records[uri])
+        self.assertNotIn(self.file, client.records)
+        self.assertNotIn(self.series, client.records)
 
-    def test_data_deleters(self):
-        pass
+    def test_dry_run(self):
+        """Checks that dry runs report deletions without changing data."""
+        uri = "/repositories/2/archival_objects/3"
+        client = MockClient(self.records)
+        deleter = deleters.BulkDeleter(client, dry_run=True)
+        results = list(deleter.delete([
+            self.resource, self.file, FieldDeletion(uri, "subjects", "/subjects/1")]))
+        self.assertEqual([r.uri for r in results], [uri, self.file, self.resource])
+        self.assertFalse(any(r.deleted for r in results))
+        self.assertEqual(results[0].data, "Would delete /subjects/1 from subjects")
+        self.assertEqual(
+            [r[0] for r in client.requests], ["GET"])
+        self.assertIn(self.file, client.records)
 
 
 if __name__ == '__main__':
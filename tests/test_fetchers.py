@@ -0,0 +1,99 @@
+"""
+Unit tests for Fetchers
+"""
+import time
+import unittest
+
+from asnake.jsonmodel import wrap_json_object
+from rac_aspace import data_helpers
+from rac_aspace.fetchers import Fetcher, FetchError, RateLimiter
+
+from .helpers import MockClient, archival_object
+
+
+def titled(uri):
+    return archival_object(uri, title=uri.split("/")[-1])
+
+
+class TestFetchers(unittest.TestCase):
+    """Tests concurrent fetching of ArchivesSpace objects."""
+
+    def setUp(self):
+        self.uris = ["/repositories/2/archival_objects/{}".format(i)
+                     for i in range(1, 41)]
+
+    def test_ordered_fetch(self):
+        """Checks that results are streamed in the order of the input."""
+        client = MockClient(default=titled, delays={self.uris[0]: 0.05})
+        fetcher = Fetcher(client, max_workers=4)
+        results = [obj.uri for obj in fetcher.fetch(self.uris)]
+        self.assertEqual(results, self.uris)
+        self.assertEqual(len(client.requests), len(self.uris))
+
+    def test_unordered_fetch(self):
+        """Checks that unordered results are streamed as they complete."""
+        client = MockClient(default=titled, delays={self.uris[0]: 0.05})
+        fetcher = Fetcher(client, max_workers=4)
+        results = [obj.uri for obj in fetcher.fetch(self.uris, ordered=False)]
+        self.assertEqual(set(results), set(self.uris))
+        self.assertNotEqual(results[0], self.uris[0])
+
+    def test_fetch_objects(self):
+        """Checks that refs are resolved and resolved objects are passed through."""
+        client = MockClient(default=titled)
+        ref = wrap_json_object({"ref": self.uris[0]}, client=client)
+        resolved = wrap_json_object(
+            {"jsonmodel_type": "archival_object", "uri": self.uris[1]},
+            client=client)
+        results = list(Fetcher(client).fetch([ref, resolved]))
+        self.assertEqual([r.uri for r in results], self.uris[:2])
+        self.assertFalse(results[0].is_ref)
+        self.assertIs(results[1], resolved)
+        self.assertEqual(client.requested(), [self.uris[0]])
+
+    def test_retries(self):
+        """Checks that failed requests are retried and eventually raise."""
+        client = MockClient(default=titled, failures=2)
+        fetcher = Fetcher(client, retries=2, backoff=0)
+        self.assertEqual(fetcher.get(self.uris[0])["uri"], self.uris[0])
+        self.assertEqual(len(client.requests), 3)
+
+        client = MockClient(default=titled, failures=3)
+        fetcher = Fetcher(client, retries=2, backoff=0)
+        with self.assertRaises(FetchError):
+            fetcher.get(self.uris[0])
+
+        client = MockClient(default=titled, failures=1, status_code=404)
+        fetcher = Fetcher(client, retries=2, backoff=0)
+        with self.assertRaises(FetchError) as excpt:
+            fetcher.get(self.uris[0])
+        self.assertEqual(excpt.exception.status_code, 404)
+        self.assertEqual(len(client.requests), 1)
+
+    def test_rate_limiter(self):
+        """Checks that requests are spaced out by the rate limiter."""
+        limiter = RateLimiter(100)
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.wait()
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_helpers(self):
+        """Checks that data helpers resolve objects through a fetcher."""
+        client = MockClient(default=titled)
+        refs = [wrap_json_object({"ref": uri}, client=client)
+                for uri in self.uris[:3]]
+        orphans = list(data_helpers.get_orphans(
+            refs, "title", fetcher=Fetcher(client)))
+        self.assertEqual(orphans, [])
+        archival_object = wrap_json_object(
+            {"jsonmodel_type": "archival_object", "uri": self.uris[3],
+             "title": "", "ancestors": [{"ref": uri} for uri in self.uris[:2]]},
+            client=client)
+        value = data_helpers.closest_value(
+            archival_object, "title", fetcher=Fetcher(client))
+        self.assertEqual(value, "1")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Unit tests for incremental processing
+"""
+import csv
+import time
+import unittest
+from os import remove
+from os.path import isfile
+
+from rac_aspace import serializers
+from rac_aspace.fetchers import Fetcher
+from rac_aspace.incremental import CHECKPOINT_MARGIN, IncrementalRunner
+
+from .helpers import MockClient, archival_object
+
+
+def title_row(record):
+    if record.title:
+        return {"uri": record.uri, "title": record.title}
+
+
+class TestIncremental(unittest.TestCase):
+    """Tests incremental runs merged into serialized output."""
+
+    def setUp(self):
+        self.checkpoint = "checkpoint.json"
+        self.filename = "report.csv"
+        self.record_type_uri = "/repositories/2/archival_objects"
+        self.modified = {}
+
+    def modified_ids(self, params):
+        return [i for i, mtime in self.modified.items()
+                if mtime >= params.get("modified_since", 0)]
+
+    def set_titles(self, client, titles, modified):
+        for i, title in titles.items():
+            uri = "{}/{}".format(self.record_type_uri, i)
+            client.records[uri] = archival_object(uri, title=title)
+            self.modified[i] = modified
+
+    def read_rows(self):
+        with open(self.filename, "r") as f:
+            return [r for r in csv.reader(f)]
+
+    def test_incremental_runs(self):
+        """Checks that only modified records are reprocessed and merged."""
+        client = MockClient(routes={self.record_type_uri: self.modified_ids})
+        self.set_titles(client, {1: "One", 2: "Two", 3: "Three"}, 10)
+        runner = IncrementalRunner(
+            client, serializers.CSVSerializer(self.filename), self.checkpoint)
+        self.assertEqual(runner.run(self.record_type_uri, title_row), 3)
+        self.assertEqual(client.requests[0][2]["modified_since"], 0)
+        self.assertEqual(len(self.read_rows()), 4)
+        checkpoint = runner.load_checkpoint()
+        self.assertGreater(checkpoint, 0)
+        self.assertLessEqual(
+            checkpoint, time.time() - CHECKPOINT_MARGIN)
+
+        self.set_titles(client, {2: "Second", 3: "", 4: "Four"}, checkpoint)
+        del self.modified[1]
+        client.requests = []
+        self.assertEqual(runner.run(
+            self.record_type_uri, title_row, fetcher=Fetcher(client)), 3)
+        self.assertEqual(client.requests[0][2]["modified_since"], checkpoint)
+        self.assertNotIn("/repositories/2/archival_objects/1", client.requested())
+        self.assertEqual(self.read_rows(), [
+            ["uri", "title"],
+            ["/repositories/2/archival_objects/2", "Second"],
+            ["/repositories/2/archival_objects/4", "Four"]])
+        self.assertFalse(isfile(".report.csv"))
+
+    def test_stale_temp_file(self):
+        """Checks that a temporary file left by a failed run is not used."""
+        with open(".report.csv", "w") as f:
+            f.write("uri,title\n/repositories/2/archival_objects/9,Stale\n")
+        runner = IncrementalRunner(
+            MockClient(routes={self.record_type_uri: self.modified_ids}),
+            serializers.CSVSerializer(self.filename), self.checkpoint)
+        self.assertEqual(runner.run(self.record_type_uri, title_row), 0)
+        self.assertEqual(self.read_rows(), [])
+        self.assertFalse(isfile(".report.csv"))
+
+    def tearDown(self):
+        for filename in [self.checkpoint, self.filename, ".report.csv"]:
+            if isfile(filename):
+                remove(filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+"""
+Unit tests for Indexes
+"""
+import json
+import os
+import time
+import unittest
+
+from asnake.jsonmodel import wrap_json_object
+from rac_aspace import indexes
+from rac_aspace.incremental import CHECKPOINT_MARGIN
+
+from .helpers import MockClient
+
+
+class TestIndexes(unittest.TestCase):
+    """Tests index builders."""
+
+    def load_fixture(self, filename):
+        with open(os.path.join("fixtures", filename)) as json_file:
+            return json.load(json_file)
+
+    def test_reference_index(self):
+        """Checks that referenced URIs are indexed and orphans are found."""
+        archival_object = self.load_fixture("archival_object.json")
+        archival_object["linked_agents"] = [{"ref": "/agents/people/1"}]
+        archival_object["instances"] = [{"sub_container": {
+            "top_container": {"ref": "/repositories/2/top_containers/1"}}}]
+        resource = {
+            "jsonmodel_type": "resource", "uri": "/repositories/2/resources/1",
+            "subjects": [{"ref": "/subjects/3"}]}
+        client = MockClient(
+            records={
+                "/repositories/2/top_containers": [1, 2, 3],
+                "/agents/people": [1, 2]},
+            pages={
+                "/repositories/2/archival_objects": [archival_object],
+                "/repositories/2/resources": [resource]})
+        index = indexes.ReferenceIndex.build(client, "/repositories/2")
+        self.assertIn("/repositories/2/top_containers/1", index)
+        self.assertIn("/subjects/3", index)
+        self.assertNotIn("/subjects/4", index)
+        self.assertNotIn("/subjects", index)
+        self.assertEqual(
+            index.find_orphans(client, "/repositories/2/top_containers"),
+            ["/repositories/2/top_containers/2",
+             "/repositories/2/top_containers/3"])
+        for record_type_uri in ["/agents/people/", "/repositories/3/top_containers"]:
+            with self.assertRaises(ValueError):
+                index.find_orphans(client, record_type_uri)
+
+        client.records["/repositories"] = [
+            {"uri": "/repositories/2"}, {"uri": "/repositories/3"}]
+        client.records["/agents/people"] = [1, 2, 3, 4]
+        client.pages["/repositories/3/events"] = [
+            {"linked_agents": [{"ref": "/agents/people/2"}]}]
+        client.pages["/agents/families"] = [
+            {"related_agents": [{"ref": "/agents/people/3"}]}]
+        global_index = indexes.ReferenceIndex.build(client)
+        self.assertEqual(global_index.find_orphans(client, "/agents/people/"),
+                         ["/agents/people/4"])
+
+        index.add(wrap_json_object(resource, client=client))
+        self.assertEqual(
+            list(index.orphans(["/subjects/3", "/subjects/5"])), ["/subjects/5"])
+
+    def test_search_orphans(self):
+        """Checks that unlinked records are found with the search API."""
+        client = MockClient(pages={"/repositories/2/search": [
+            {"uri": "/repositories/2/top_containers/2"}]})
+        orphans = list(indexes.search_orphans(
+            client, "/repositories/2/", "top_container"))
+        self.assertEqual(orphans, ["/repositories/2/top_containers/2"])
+        self.assertEqual(client.requests[0][2]["q"], "empty_u_sbool:true")
+        with self.assertRaises(ValueError):
+            list(indexes.search_orphans(client, "/repositories/2", "subject"))
+        list(indexes.search_orphans(
+            client, "/repositories/2", "subject", query="foo:bar"))
+        self.assertEqual(client.requests[-1][2]["q"], "foo:bar")
+
+    def test_location_index(self):
+        """Checks that archival objects are found by location."""
+        top_container = self.load_fixture("top_container.json")
+        moved = dict(top_container, uri="/repositories/2/top_containers/2",
+                     container_locations=[
+                         {"ref": "/locations/1", "status": "previous"},
+                         {"ref": "/locations/2", "status": "current"}])
+        archival_objects = [{
+            "uri": "/repositories/2/archival_objects/{}".format(i),
+            "instances": [{"sub_container": {"top_container": {
+                "ref": container["uri"]}}}, {"digital_object": {"ref": "/x"}}],
+        } for i, container in enumerate([top_container, moved, moved], 1)]
+        client = MockClient(pages={
+            "/repositories/2/archival_objects": archival_objects,
+            "/repositories/2/top_containers": [top_container, moved],
+            "/locations": [
+                {"uri": "/locations/7799", "building": "Main", "floor": "1"},
+                {"uri": "/locations/2", "building": "Main", "floor": "2"},
+                {"uri": "/locations/1", "building": "Annex", "floor": "1"}]})
+        index = indexes.LocationIndex.build(client, "/repositories/2/")
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.objects_at("/locations/7799"),
+                         {"/repositories/2/archival_objects/1"})
+        self.assertEqual(index.objects_at("/locations/1"), set())
+        self.assertEqual(index.objects_where(building="Main", floor="2"),
+                         {"/repositories/2/archival_objects/2",
+                          "/repositories/2/archival_objects/3"})
+        self.assertEqual(len(index.objects_where(building="Main")), 3)
+        self.assertEqual(index.containers_where(building="Annex"), set())
+        self.assertEqual(index.locations(floor="1"),
+                         {"/locations/7799", "/locations/1"})
+
+        filename = "location_index.json"
+        try:
+            index.save(filename)
+            loaded = indexes.LocationIndex.load(filename)
+        finally:
+            os.remove(filename)
+        self.assertEqual(loaded.objects_where(building="Main"),
+                         index.objects_where(building="Main"))
+        loaded.add_location({"uri": "/locations/2", "building": "Annex"})
+        self.assertEqual(loaded.containers_where(building="Annex"),
+                         {"/repositories/2/top_containers/2"})
+        self.assertEqual(loaded.locations(building="Main"), {"/locations/7799"})
+
+    def test_resource_identifier_index(self):
+        """Checks identifier lookups, bulk formatting and refreshing."""
+        resource = self.load_fixture("archival_object.json")
+        resources = [dict(resource, uri="/repositories/2/resources/{}".format(i),
+                          id_0="FA{}".format(i), id_1="2", id_2=None, id_3=None)
+                     for i in range(1, 4)]
+        client = MockClient(pages={"/repositories/2/resources": resources})
+        index = indexes.ResourceIdentifierIndex.build(client, "/repositories/2/")
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.uri("FA2:2"), "/repositories/2/resources/2")
+        self.assertIsNone(index.uri("FA2"))
+        self.assertEqual(index.identifier("/repositories/2/resources/1"), "FA1:2")
+        self.assertEqual(
+            index.identifiers(["/repositories/2/resources/3", "/missing"], "-"),
+            {"/repositories/2/resources/3": "FA3-2"})
+        self.assertLessEqual(
+            index.modified_since["/repositories/2"],
+            time.time() - CHECKPOINT_MARGIN)
+
+        changed = dict(resources[0], id_1="3")
+        added = dict(resources[0], uri="/repositories/2/resources/4", id_0="FA4")
+        client.records = {
+            "/repositories/2/resources/1": changed,
+            "/repositories/2/resources/4": added}
+        client.routes["/repositories/2/resources"] = lambda params: (
+            [1, 4] if "modified_since" in params else [1, 2, 4])
+        self.assertEqual(index.refresh(client, "/repositories/2"), 3)
+        self.assertEqual(index.identifiers(), {
+            "/repositories/2/resources/1": "FA1:3",
+            "/repositories/2/resources/2": "FA2:2",
+            "/repositories/2/resources/4": "FA4:2"})
+        self.assertIsNone(index.uri("FA1:2"))
+        self.assertEqual(index.uri("FA1:3"), "/repositories/2/resources/1")
+
+
+if __name__ == '__main__':
+    unittest.main()
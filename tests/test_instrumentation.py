@@ -0,0 +1,102 @@
+"""
+Unit tests for instrumentation
+"""
+import json
+import unittest
+from datetime import timedelta
+from os import remove
+from os.path import isfile
+from unittest.mock import Mock
+
+from requests.hooks import dispatch_hook
+from rac_aspace import cache, data_helpers, instrumentation, serializers
+from rac_aspace.instrumentation import Instrumentation
+
+from .helpers import MockClient, archival_object
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Tests recording of helper calls, requests and cache lookups."""
+
+    def setUp(self):
+        self.note = {"jsonmodel_type": "note_singlepart", "type": "abstract",
+                     "content": ["Go Mets!"]}
+        self.filename = "instrumentation.json"
+
+    def test_calls(self):
+        """Checks that helper calls are only recorded inside a block."""
+        data_helpers.get_note_text(self.note)
+        with Instrumentation() as instrumented:
+            data_helpers.get_note_text(self.note)
+            data_helpers.get_note_text(self.note)
+            data_helpers.text_in_note(self.note, "go mets")
+        data_helpers.get_note_text(self.note)
+        calls = instrumented.summary()["calls"]
+        # text_in_note calls get_note_text itself
+        self.assertEqual(calls["data_helpers.get_note_text"]["count"], 3)
+        self.assertEqual(calls["data_helpers.text_in_note"]["count"], 1)
+        self.assertGreater(instrumented.elapsed, 0)
+        self.assertEqual(instrumentation.ACTIVE, [])
+
+    def test_nested(self):
+        """Checks that outer blocks also record calls made in inner blocks."""
+        with Instrumentation() as outer:
+            data_helpers.get_note_text(self.note)
+            with Instrumentation() as inner:
+                data_helpers.get_note_text(self.note)
+        self.assertEqual(outer.calls["data_helpers.get_note_text"][0], 2)
+        self.assertEqual(inner.calls["data_helpers.get_note_text"][0], 1)
+
+    def test_generators(self):
+        """Checks that generators are recorded and still yield every item."""
+        rows = [{"uri": "/repositories/2/archival_objects/{}".format(i)}
+                for i in range(5)]
+        serializer = serializers.CSVSerializer("instrumentation.csv")
+        with Instrumentation() as instrumented:
+            serializer.write_data(rows)
+            read = list(serializers.CSVSerializer(
+                serializer.filename, filemode="r").iter_rows())
+        remove(serializer.filename)
+        self.assertEqual(read, rows)
+        self.assertEqual(
+            instrumented.calls["serializers.BaseSerializer.write_data"][0], 1)
+        self.assertEqual(
+            instrumented.calls["serializers.BaseSerializer.iter_rows"][0], 1)
+
+    def test_requests(self):
+        """Checks that responses of instrumented clients are recorded."""
+        client = instrumentation.instrument_client(MockClient())
+        instrumentation.instrument_client(client)
+        response = Mock(content=b"{}", elapsed=timedelta(seconds=0.5),
+                        request=Mock(method="GET"))
+        dispatch_hook("response", client.session.hooks, response)
+        with Instrumentation() as instrumented:
+            dispatch_hook("response", client.session.hooks, response)
+        self.assertEqual(instrumented.summary()["requests"]["GET"],
+                         {"count": 1, "bytes": 2, "seconds": 0.5})
+
+    def test_caches(self):
+        """Checks that cache hits and misses are recorded."""
+        client = cache.CachingClient(MockClient(default=archival_object))
+        with Instrumentation() as instrumented:
+            client.get("/repositories/2/archival_objects/1")
+            client.get("/repositories/2/archival_objects/1")
+        self.assertEqual(instrumented.summary()["caches"]["RecordCache"],
+                         {"hits": 1, "misses": 1})
+
+    def test_export(self):
+        """Checks that summaries can be exported as JSON and as a report."""
+        with Instrumentation() as instrumented:
+            data_helpers.get_note_text(self.note)
+        data = json.loads(instrumented.to_json(self.filename))
+        self.assertTrue(isfile(self.filename))
+        self.assertEqual(data["calls"]["data_helpers.get_note_text"]["count"], 1)
+        self.assertIn("data_helpers.get_note_text", instrumented.report())
+
+    def tearDown(self):
+        if isfile(self.filename):
+            remove(self.filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Unit tests for the offline backend
+"""
+import json
+import os
+import unittest
+from os import remove
+from os.path import isfile
+
+from rac_aspace import data_helpers, indexes
+from rac_aspace.fetchers import Fetcher
+from rac_aspace.offline import OfflineClient
+
+
+class TestOffline(unittest.TestCase):
+    """Tests serving records from a newline-delimited JSON dump."""
+
+    def setUp(self):
+        self.filename = "dump.jsonl"
+        with open(os.path.join("fixtures", "archival_object.json")) as f:
+            self.resource = json.load(f)
+        with open(os.path.join("fixtures", "top_container.json")) as f:
+            self.top_container = json.load(f)
+        self.archival_object = {
+            "jsonmodel_type": "archival_object",
+            "uri": "/repositories/2/archival_objects/1",
+            "title": "Ünïcode title",
+            "dates": [],
+            "ancestors": [{"ref": self.resource["uri"], "level": "collection"}],
+            "instances": [{
+                "jsonmodel_type": "instance",
+                "sub_container": {
+                    "jsonmodel_type": "sub_container",
+                    "top_container": {"ref": self.top_container["uri"]}}}],
+        }
+        with open(self.filename, "w", encoding="utf-8") as f:
+            for record in [self.resource, self.top_container, {"title": "no uri"},
+                           self.archival_object]:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n\n")
+
+    def test_get(self):
+        """Checks that records are served by URI, with and without memory maps."""
+        for memory_map in [True, False]:
+            with OfflineClient(self.filename, memory_map=memory_map) as client:
+                self.assertEqual(len(client), 3)
+                self.assertIn(self.top_container["uri"], client)
+                response = client.get(self.archival_object["uri"])
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), self.archival_object)
+                self.assertEqual(
+                    client.get("/repositories/2/archival_objects/2").status_code, 404)
+
+    def test_params(self):
+        """Checks that id_set and all_ids requests are supported."""
+        with OfflineClient(self.filename) as client:
+            containers = client.get("/repositories/2/top_containers",
+                                    params={"id_set": [191155, 1]}).json()
+            self.assertEqual(containers, [self.top_container])
+            self.assertEqual(client.get("/repositories/2/archival_objects",
+                                        params={"all_ids": True}).json(), [1])
+            empty = client.get("/repositories/2/events", params={"all_ids": True})
+            self.assertEqual(empty.status_code, 200)
+            self.assertEqual(empty.json(), [])
+            route = client.get(self.archival_object["uri"] + "/component_id",
+                               params={"all_ids": True})
+            self.assertEqual(route.status_code, 404)
+            self.assertFalse(hasattr(
+                client.get_object(self.archival_object["uri"]), "component_id"))
+            self.assertEqual(
+                list(client.get_paged("/repositories/2/archival_objects")),
+                [self.archival_object])
+            self.assertEqual(list(client.get_paged("/repositories/2/events")), [])
+
+    def test_indexes(self):
+        """Checks that indexes can be built from the dump."""
+        with OfflineClient(self.filename) as client:
+            index = indexes.ReferenceIndex.build(client, "/repositories/2")
+            self.assertIn(self.top_container["uri"], index)
+            self.assertEqual(
+                index.find_orphans(client, "/repositories/2/top_containers"), [])
+
+    def test_helpers(self):
+        """Checks that data helpers resolve refs from the dump."""
+        with OfflineClient(self.filename) as client:
+            archival_object = client.get_object(self.archival_object["uri"])
+            locations = data_helpers.object_locations(archival_object)
+            self.assertEqual(locations[0].ref, "/locations/7799")
+            self.assertEqual(
+                data_helpers.object_locations_batch([archival_object])[
+                    archival_object.uri][0].ref, "/locations/7799")
+            self.assertEqual(
+                data_helpers.closest_value(archival_object, "dates")[0].begin,
+                self.resource["dates"][0]["begin"])
+            fetched = list(Fetcher(client).fetch([self.resource["uri"]]))
+            self.assertEqual(fetched[0].title, self.resource["title"])
+            with self.assertRaises(TypeError):
+                client.post(archival_object.uri, json={})
+
+    def tearDown(self):
+        if isfile(self.filename):
+            remove(self.filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Unit tests for Pipelines
+"""
+import unittest
+from functools import partial
+from os import remove
+from os.path import isfile
+
+from rac_aspace import data_helpers, serializers
+from rac_aspace.pipelines import Pipeline
+
+
+def get_uri(archival_object):
+    return archival_object["uri"]
+
+
+def note_text(archival_object):
+    return " ".join(text for _, text in data_helpers.iter_note_text(
+        archival_object, strip_html=True))
+
+
+class TestPipelines(unittest.TestCase):
+    """Tests processing archival objects with worker processes."""
+
+    def setUp(self):
+        self.records = [{
+            "uri": "/repositories/2/archival_objects/{}".format(i),
+            "notes": [{
+                "jsonmodel_type": "note_singlepart", "type": "accessrestrict",
+                "content": ["Closed" if i % 3 else "<p>Open</p>"]}],
+            "rights_statements": [],
+        } for i in range(1, 101)]
+        self.fields = [
+            ("uri", get_uri),
+            ("text", note_text),
+            ("restricted", partial(data_helpers.is_restricted,
+                                   query_string="closed",
+                                   restriction_acts=["disallow"])),
+            ("notes", partial(data_helpers.iter_note_text, strip_html=True)),
+        ]
+        self.filename = "pipeline.csv"
+
+    def test_run(self):
+        """Checks that rows are produced in the order of the input."""
+        rows = list(Pipeline(self.fields, processes=2, chunk_size=7).run(self.records))
+        self.assertEqual([row["uri"] for row in rows],
+                         [record["uri"] for record in self.records])
+        self.assertEqual(rows[0], {
+            "uri": "/repositories/2/archival_objects/1", "text": "Closed",
+            "restricted": True, "notes": [("accessrestrict", "Closed")]})
+        self.assertFalse(rows[2]["restricted"])
+
+    def test_single_process(self):
+        """Checks that processing in the current process gives the same rows."""
+        self.assertEqual(
+            list(Pipeline(self.fields, processes=1).run(self.records)),
+            list(Pipeline(self.fields, processes=2).run(self.records)))
+
+    def test_write(self):
+        """Checks that rows are written with a serializer."""
+        serializer = serializers.CSVSerializer(self.filename)
+        count = Pipeline(self.fields[:3], processes=2, chunk_size=10).write(
+            self.records, serializer)
+        self.assertEqual(count, len(self.records))
+        rows = serializers.CSVSerializer(self.filename, filemode="r").read_data()
+        self.assertEqual(list(rows[0].keys()), ["uri", "text", "restricted"])
+        self.assertEqual(rows[-1]["uri"], self.records[-1]["uri"])
+
+    def tearDown(self):
+        if isfile(self.filename):
+            remove(self.filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
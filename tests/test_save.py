@@ -3,11 +3,84 @@ Unit tests for write operations in ArchivesSpace
 """
 import unittest
 
+from asnake.jsonmodel import wrap_json_object
+from rac_aspace import savers
+
+from .helpers import MockClient
+
 
 class TestDataSavers(unittest.TestCase):
+    """Tests bulk creates and updates."""
+
+    def setUp(self):
+        self.records = {
+            "/repositories/2/archival_objects/{}".format(i): {
+                "uri": "/repositories/2/archival_objects/{}".format(i),
+                "title": "Title {}".format(i), "lock_version": 0}
+            for i in range(1, 6)}
+
+    def test_editable_json(self):
+        """Checks that editable copies do not modify the original record."""
+        record = self.records["/repositories/2/archival_objects/1"]
+        obj = wrap_json_object(dict(record, jsonmodel_type="archival_object"))
+        for source in [record, obj]:
+            data = savers.editable_json(source)
+            data["title"] = "changed"
+        self.assertEqual(record["title"], "Title 1")
+        self.assertEqual(obj.title, "Title 1")
+
+    def test_apply_change(self):
+        """Checks that dict and callable changes are applied."""
+        data = {"title": "Title"}
+        self.assertEqual(savers.apply_change(data, {"title": "New"}),
+                         {"title": "New"})
+        self.assertEqual(
+            savers.apply_change(data, lambda d: d.update(title="Newer")),
+            {"title": "Newer"})
+        self.assertEqual(
+            savers.apply_change(data, lambda d: {"title": "Newest"}),
+            {"title": "Newest"})
+
+    def test_update(self):
+        """Checks that updates are saved, retried on conflict and reported."""
+        client = MockClient(self.records, conflicts=1,
+                            failing=["/repositories/2/archival_objects/5"])
+        saver = savers.BulkSaver(client, max_workers=2)
+        updates = [(uri, {"title": "Updated"}) for uri in self.records]
+        results = {r.uri: r for r in saver.update(updates)}
+        self.assertEqual(set(results), set(self.records))
+        failed = results.pop("/repositories/2/archival_objects/5")
+        self.assertFalse(failed.saved)
+        self.assertIn("Connection refused", failed.data)
+        for uri, result in results.items():
+            self.assertTrue(result.saved)
+            self.assertEqual(client.records[uri]["title"], "Updated")
+
+    def test_conflict_retries(self):
+        """Checks that repeated conflicts are eventually reported."""
+        client = MockClient(self.records, conflicts=10)
+        saver = savers.BulkSaver(client, conflict_retries=2)
+        record = self.records["/repositories/2/archival_objects/1"]
+        result = next(saver.update([(record, {"title": "Updated"})]))
+        self.assertFalse(result.saved)
+        self.assertEqual(result.status_code, 409)
+        self.assertEqual(len(client.requested("POST")), 3)
+
+        result = next(saver.update(
+            [("/repositories/2/archival_objects/9", {"title": "Updated"})]))
+        self.assertFalse(result.saved)
+        self.assertIn("status 404", result.data)
 
-    def test_data_savers(self):
-        pass
+    def test_create(self):
+        """Checks that new records are created."""
+        client = MockClient({})
+        saver = savers.BulkSaver(client)
+        results = list(saver.create(
+            [{"title": "New {}".format(i)} for i in range(3)],
+            "/repositories/2/archival_objects"))
+        self.assertTrue(all(r.saved for r in results))
+        self.assertEqual(len(client.records), 3)
+        self.assertEqual(set(r.uri for r in results), set(client.records))
 
 
 if __name__ == '__main__':
@@ -2,12 +2,24 @@
 Unit tests for Serializers
 """
 import csv
+import tempfile
 import unittest
 from os import remove
-from os.path import isfile
+from os.path import getsize, isfile, join
 
 from rac_aspace import serializers
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
 
 class TestSerializers(unittest.TestCase):
     """Tests CSV and TSV serializers."""
@@ -46,6 +58,17 @@ class TestSerializers(unittest.TestCase):
         """Tests TSVSerializer."""
         self.check_serializer(serializers.TSVSerializer)
 
+    def test_dotted_directory(self):
+        """Tests that only the filename, not its directory, gets an extension."""
+        with tempfile.TemporaryDirectory(suffix=".dir") as directory:
+            for filename, expected in [
+                    ("data", "data.csv"), ("data.txt", "data.csv"),
+                    ("data.gz", "data.csv.gz"), ("data.tsv.gz", "data.csv.gz")]:
+                serializer = serializers.CSVSerializer(join(directory, filename))
+                self.assertEqual(serializer.filename, join(directory, expected))
+                serializer.write_data(self.short_data)
+                self.assertTrue(isfile(join(directory, expected)))
+
     def test_filemodes(self):
         """Tests different filemodes.
 
@@ -72,6 +95,55 @@ class TestSerializers(unittest.TestCase):
         for filename in ["test.tsv", "test.csv"]:
             remove(filename)
 
+    def test_streaming_writes(self):
+        """Tests writing generators in batches and appending without headers."""
+        for serializer in [serializers.CSVSerializer,
+                           serializers.TSVSerializer]:
+            expected_filepath = "spreadsheet.{}".format(serializer.extension)
+            rows = ({"column1": i, "column2": i * 2} for i in range(25))
+            written = serializer("spreadsheet").write_data(rows, batch_size=10)
+            self.assertEqual(written, 25)
+            appender = serializer("spreadsheet", filemode="a")
+            appender.write_data(iter(self.long_data), batch_size=1)
+            appender.write_data(
+                self.short_data, fieldnames=["column1", "column2"])
+            self.assertEqual(appender.write_data(iter([])), 0)
+            with open(expected_filepath, "r") as out_file:
+                reader = csv.reader(out_file, delimiter=serializer.delimiter)
+                out_data = [r for r in reader]
+            self.assertEqual(out_data[0], ["column1", "column2"])
+            self.assertEqual(out_data.count(["column1", "column2"]), 1)
+            self.assertEqual(len(out_data), 25 + len(self.long_data) + len(self.short_data) + 1)
+
+        serializer = serializers.CSVSerializer("spreadsheet", filemode="a")
+        serializer.write_data({"column1": "value", "column2": "value"})
+        with open("spreadsheet.csv", "r") as out_file:
+            self.assertEqual(len(out_file.readlines()), 1 + 25 + 3 + 1)
+
+    def test_empty_writes(self):
+        """Checks that writing no rows replaces the file in write mode."""
+        for serializer in [serializers.CSVSerializer,
+                           serializers.TSVSerializer]:
+            filename = "spreadsheet.{}".format(serializer.extension)
+            serializer(filename).write_data(self.long_data)
+            serializer(filename, filemode="a").write_data(iter([]))
+            self.assertEqual(len(serializer(filename, filemode="r").read_data()), 2)
+            self.assertEqual(serializer(filename).write_data(iter([])), 0)
+            self.assertEqual(getsize(filename), 0)
+            serializer(filename).write_data([], fieldnames=["column1"])
+            with open(filename, "r") as out_file:
+                self.assertEqual(out_file.read().strip(), "column1")
+        if pyarrow:
+            serializer = serializers.ParquetSerializer("spreadsheet")
+            serializer.write_data(self.long_data)
+            serializer.write_data(iter([]))
+            reader = serializers.ParquetSerializer("spreadsheet", filemode="r")
+            self.assertEqual(reader.read_data(), [])
+            serializer.write_data([], fieldnames=["column1"])
+            self.assertEqual(
+                pyarrow.parquet.ParquetFile("spreadsheet.parquet").schema_arrow.names,
+                ["column1"])
+
     def test_read_data(self):
         """Tests correct returned from a CSV or TSV file."""
         filename = "read_file.csv"
@@ -86,8 +158,122 @@ class TestSerializers(unittest.TestCase):
         self.assertEqual(read, self.long_data)
         remove(filename)
 
+    def test_iter_rows(self):
+        """Tests lazy, chunked and typed reads using the class delimiter."""
+        for serializer in [serializers.CSVSerializer,
+                           serializers.TSVSerializer]:
+            filename = "spreadsheet.{}".format(serializer.extension)
+            rows = [{"column1": str(i), "column2": "value {}".format(i)}
+                    for i in range(5)]
+            serializer(filename).write_data(rows)
+            reader = serializer(filename, filemode="r")
+            self.assertEqual(reader.read_data(), rows)
+            self.assertEqual(
+                [len(chunk) for chunk in reader.iter_rows(chunk_size=2)],
+                [2, 2, 1])
+            typed = list(reader.iter_rows(converters={"column1": int}))
+            self.assertEqual([r["column1"] for r in typed], list(range(5)))
+            self.assertEqual(typed[0]["column2"], "value 0")
+            with self.assertRaises(TypeError):
+                next(serializer(filename).iter_rows())
+
+    def test_compressed_files(self):
+        """Tests that compressed files are transparently written and read."""
+        compressions = ["gz", "bz2", "xz"] + (["zst"] if zstandard else [])
+        for serializer in [serializers.CSVSerializer,
+                           serializers.TSVSerializer]:
+            for compression in compressions:
+                expected_filepath = "spreadsheet.{}.{}".format(
+                    serializer.extension, compression)
+                for filepath in [expected_filepath,
+                                 "spreadsheet.{}".format(compression),
+                                 "spreadsheet.jpeg.{}".format(compression)]:
+                    self.assertEqual(
+                        serializer(filepath).filename, expected_filepath)
+                serializer(expected_filepath).write_data(self.long_data)
+                serializer(expected_filepath, filemode="a").write_data(
+                    self.short_data)
+                read = serializer(expected_filepath, filemode="r").read_data()
+                self.assertEqual(read, self.long_data + self.short_data)
+                remove(expected_filepath)
+
+    def test_memory_map(self):
+        """Tests reading uncompressed files through a memory map."""
+        for serializer in [serializers.CSVSerializer,
+                           serializers.TSVSerializer]:
+            filename = "spreadsheet.{}".format(serializer.extension)
+            serializer(filename).write_data(self.long_data)
+            reader = serializer(filename, filemode="r")
+            self.assertEqual(
+                list(reader.iter_rows(memory_map=True)), self.long_data)
+            self.assertEqual(
+                list(reader.iter_rows(chunk_size=1, memory_map=True)),
+                [[row] for row in self.long_data])
+
+    @unittest.skipUnless(pyarrow, "pyarrow is not installed")
+    def test_parquet_serializer(self):
+        """Tests writing row groups and reading selected columns from Parquet."""
+        rows = ({"column1": i, "column2": "value {}".format(i)}
+                for i in range(25))
+        serializer = serializers.ParquetSerializer("spreadsheet.csv")
+        self.assertEqual(serializer.filename, "spreadsheet.parquet")
+        self.assertEqual(serializer.write_data(rows, batch_size=10), 25)
+        with self.assertRaises(TypeError):
+            serializer.read_data()
+        reader = serializers.ParquetSerializer("spreadsheet", filemode="r")
+        with self.assertRaises(TypeError):
+            reader.write_data(self.short_data)
+        read = reader.read_data()
+        self.assertEqual(len(read), 25)
+        self.assertEqual(read[3], {"column1": 3, "column2": "value 3"})
+        self.assertEqual(
+            list(reader.iter_rows(columns=["column2"]))[0], {"column2": "value 0"})
+        self.assertEqual(
+            [len(c) for c in reader.iter_rows(chunk_size=10)], [10, 10, 5])
+        self.assertEqual(
+            pyarrow.parquet.ParquetFile("spreadsheet.parquet").num_row_groups, 3)
+        with self.assertRaises(TypeError):
+            serializers.ParquetSerializer("spreadsheet", filemode="a")
+
+    @unittest.skipUnless(pyarrow, "pyarrow is not installed")
+    def test_parquet_schema(self):
+        """Tests that Parquet column types are inferred and enforced across batches."""
+        rows = [{"column1": i, "column2": None} for i in range(10)]
+        rows += [{"column1": 10, "column2": "value"}]
+        serializer = serializers.ParquetSerializer("spreadsheet")
+        self.assertEqual(serializer.write_data(rows, batch_size=5), 11)
+        read = serializers.ParquetSerializer("spreadsheet", filemode="r").read_data()
+        self.assertEqual(read, rows)
+
+        truncated = [{"column1": 1}, {"column1": 2.5}]
+        with self.assertRaises(pyarrow.ArrowInvalid):
+            serializer.write_data(truncated, batch_size=1)
+        schema = pyarrow.schema([("column1", pyarrow.float64())])
+        serializer.write_data(truncated, batch_size=1, schema=schema)
+        read = serializers.ParquetSerializer("spreadsheet", filemode="r").read_data()
+        self.assertEqual(read, [{"column1": 1.0}, {"column1": 2.5}])
+
+        empty = [{"column1": None}, {"column1": None}]
+        serializer.write_data(empty, batch_size=1)
+        read = serializers.ParquetSerializer("spreadsheet", filemode="r").read_data()
+        self.assertEqual(read, empty)
+
+        def sparse_rows():
+            for i in range(10):
+                if i == 2 * serializer.INFERENCE_BATCHES:
+                    self.assertTrue(isfile("spreadsheet.parquet"))
+                yield {"column1": i, "column2": "value" if i == 9 else None}
+        remove("spreadsheet.parquet")
+        self.assertEqual(serializer.write_data(sparse_rows(), batch_size=2), 10)
+        read = serializers.ParquetSerializer("spreadsheet", filemode="r").read_data()
+        self.assertEqual(read[-1], {"column1": 9, "column2": "value"})
+        self.assertEqual(
+            pyarrow.parquet.ParquetFile("spreadsheet.parquet").schema_arrow.field(
+                "column2").type, pyarrow.string())
+
     def tearDown(self):
-        for filename in ["spreadsheet.csv", "spreadsheet.tsv"]:
+        for filename in ["spreadsheet.csv", "spreadsheet.tsv",
+                         "spreadsheet.parquet"]:
             if isfile(filename):
                 remove(filename)
 
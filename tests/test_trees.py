@@ -0,0 +1,111 @@
+"""
+Unit tests for tree walkers
+"""
+import unittest
+
+from asnake.jsonmodel import wrap_json_object
+from rac_aspace import data_helpers
+from rac_aspace.fetchers import Fetcher
+from rac_aspace.trees import EMPTY_CONTEXT, TreeWalker
+
+from .helpers import MockClient
+
+
+RESOURCE = "/repositories/2/resources/1"
+
+
+def summary(uri, child_count=0, waypoints=0):
+    return {"uri": uri, "child_count": child_count, "waypoints": waypoints}
+
+
+def tree_client():
+    """Serves a resource tree through the root and waypoint endpoints.
+
+    The resource has two series; the first series has three files, served in
+    waypoints of two children.
+    """
+    ao = "/repositories/2/archival_objects/{}".format
+    records = {
+        RESOURCE: {
+            "jsonmodel_type": "resource", "uri": RESOURCE,
+            "dates": [{"expression": "1900-1950"}], "restrictions": False,
+            "extents": [{"number": "5"}]},
+        ao(1): {"jsonmodel_type": "archival_object", "uri": ao(1),
+                "restrictions_apply": True, "dates": [], "extents": [],
+                "instances": [{"sub_container": {"top_container": {
+                    "ref": "/repositories/2/top_containers/1"}}}]},
+        ao(2): {"jsonmodel_type": "archival_object", "uri": ao(2),
+                "dates": [{"expression": "1920"}], "extents": [{"number": "2"}]},
+    }
+    for i in range(3, 6):
+        records[ao(i)] = {
+            "jsonmodel_type": "archival_object", "uri": ao(i), "extents": []}
+    waypoints = {
+        (None, 0): [summary(ao(1), 3, 2), summary(ao(2), 0, 0)],
+        (ao(1), 0): [summary(ao(3)), summary(ao(4))],
+        (ao(1), 1): [summary(ao(5))],
+    }
+    records[RESOURCE + "/tree/root"] = {
+        "uri": RESOURCE, "child_count": 2, "waypoints": 1,
+        "precomputed_waypoints": {"": {"0": waypoints[(None, 0)]}}}
+    return MockClient(records, routes={
+        RESOURCE + "/tree/waypoint": lambda params: waypoints[
+            (params.get("parent_node"), params["offset"])]})
+
+
+class TestTrees(unittest.TestCase):
+    """Tests breadth-first tree walking."""
+
+    def test_walk(self):
+        """Checks that objects are yielded level by level with inherited context."""
+        client = tree_client()
+        walker = TreeWalker(fetcher=Fetcher(client, max_workers=2))
+        items = list(walker.walk(RESOURCE))
+        self.assertEqual(
+            [(item.record.uri[-1], item.depth) for item in items],
+            [("1", 1), ("2", 1), ("3", 2), ("4", 2), ("5", 2)])
+        series, other, files = items[0], items[1], items[2:]
+        self.assertEqual(series.context["ancestors"], [RESOURCE])
+        self.assertEqual(series.context["dates"], [{"expression": "1900-1950"}])
+        self.assertTrue(series.context["restricted"])
+        self.assertFalse(other.context["restricted"])
+        self.assertEqual(other.context["dates"], [{"expression": "1920"}])
+        for item in files:
+            self.assertEqual(item.context["ancestors"],
+                             [series.record.uri, RESOURCE])
+            self.assertTrue(item.context["restricted"])
+            self.assertEqual(item.context["container_refs"],
+                             ["/repositories/2/top_containers/1"])
+        record_requests = [uri for _, uri, params in client.requests
+                           if not params and "/tree/" not in uri]
+        self.assertEqual(len(record_requests), len(set(record_requests)))
+        self.assertNotIn(
+            ("GET", RESOURCE + "/tree/waypoint", {"offset": 0}),
+            client.requests)
+
+    def test_batches(self):
+        """Checks that levels are fetched in batches without changing the order."""
+        client = tree_client()
+        walker = TreeWalker(fetcher=Fetcher(client, max_workers=2), batch_size=1)
+        batches = list(walker._iter_batches(
+            RESOURCE, [(None, 1, EMPTY_CONTEXT)], {}))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(
+            [item.record.uri for batch in batches for item in batch],
+            [item.record.uri for item in TreeWalker(client).walk(RESOURCE)])
+
+    def test_resolve_tree_with_walker(self):
+        """Checks that ClosestValueResolver consumes a tree walker."""
+        client = tree_client()
+        resource = wrap_json_object(client.records[RESOURCE], client=client)
+        resolver = data_helpers.ClosestValueResolver()
+        results = {record.uri[-1]: value for record, value in resolver.resolve_tree(
+            resource, "extents", walker=TreeWalker(client))}
+        self.assertEqual(results, {
+            "1": [{"number": "5"}], "2": [{"number": "2"}],
+            "3": [{"number": "5"}], "4": [{"number": "5"}],
+            "5": [{"number": "5"}]})
+
+
+if __name__ == '__main__':
+    unittest.main()